@@ -0,0 +1,136 @@
+"""Keyword classification and branch selection over synthetic trains.
+
+The reference is the previous implementation: has_non_local_trains,
+has_local_trains and the non-local filter each lowercased train_name and
+train_type and scanned the keyword lists. The new path classifies each
+train once when it is parsed and selects in a single pass.
+
+    python benchmarks/bench_classify.py [trains] [repeats]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emergency_scraper import LOCAL_KEYWORDS, NON_LOCAL_KEYWORDS, classify_train, get_trains_by_logic
+from pytz import timezone
+
+NAMES = ["HWH BWN LOCAL", "BWN MEMU", "ANGA EXPRESS", "HJP RAJDHANI", "KOAA LKU SPL", "HWH NDLS SPECIAL",
+         "DHN PASSENGER", "ASN DMU", "SDAH KOAA EMU", "HOWRAH MAIL", "COALFIELD", "BLACK DIAMOND",
+         "GARIB RATH", "SUPER FAST EXP", "EMU SPECIAL"]
+TYPES = ["exp", "sf", "raj", "shtb", "pass", "emu", "memu", "dmu", "mail", "", "drnt"]
+
+
+def synthetic_trains(n, names=NAMES, types=TYPES, seed=7):
+    rng = random.Random(seed)
+    trains = []
+    for i in range(n):
+        name, typ = rng.choice(names), rng.choice(types)
+        trains.append({
+            'train_number': f"{i:05d}",
+            'train_name': name,
+            'train_type': typ,
+            'departure_time': f"{rng.randrange(24):02d}:{rng.randrange(60):02d}",
+            'category': classify_train(name, typ),
+        })
+    return trains
+
+
+def reference_select(sorted_trains):
+    def matches(train, keywords):
+        return any(k in train['train_name'].lower() or k in train['train_type'].lower() for k in keywords)
+
+    has_non_local = any(matches(t, NON_LOCAL_KEYWORDS) for t in sorted_trains)
+    has_local = any(matches(t, LOCAL_KEYWORDS) for t in sorted_trains)
+    if has_non_local and has_local:
+        return sorted_trains[:3], "mixed"
+    if has_non_local:
+        return [t for t in sorted_trains if matches(t, NON_LOCAL_KEYWORDS)][:3], "non_local"
+    if has_local:
+        return None, "local"
+    return sorted_trains[:3], "other"
+
+
+def one_pass_select(sorted_trains):
+    non_locals = []
+    any_local = False
+    for train in sorted_trains:
+        category = train['category']
+        if category in ('non_local', 'both'):
+            non_locals.append(train)
+        if category in ('local', 'both'):
+            any_local = True
+        if any_local and non_locals:
+            break
+    if non_locals and any_local:
+        return sorted_trains[:3], "mixed"
+    if non_locals:
+        return non_locals[:3], "non_local"
+    if any_local:
+        return None, "local"
+    return sorted_trains[:3], "other"
+
+
+def check_equivalence():
+    for name in NAMES:
+        for typ in TYPES:
+            text = (name.lower(), typ.lower())
+            non_local = any(k in part for k in NON_LOCAL_KEYWORDS for part in text)
+            local = any(k in part for k in LOCAL_KEYWORDS for part in text)
+            expected = {(True, True): 'both', (True, False): 'non_local',
+                        (False, True): 'local', (False, False): 'unknown'}[non_local, local]
+            if classify_train(name, typ) != expected:
+                sys.exit(f"classify_train({name!r}, {typ!r}) != {expected!r}")
+
+    tz = timezone("Asia/Kolkata")
+    pools = [
+        (NAMES, TYPES),
+        (["ANGA EXPRESS", "HJP RAJDHANI", "COALFIELD"], ["exp", "raj", ""]),
+        (["BWN MEMU", "DHN PASSENGER", "COALFIELD"], ["memu", "pass", ""]),
+        (["EMU SPECIAL", "COALFIELD"], [""]),
+        (["COALFIELD", "BLACK DIAMOND"], ["", "xyz"]),
+    ]
+    for seed, (names, types) in enumerate(pools):
+        trains = synthetic_trains(50, names, types, seed)
+        if reference_select(trains) != one_pass_select(trains):
+            sys.exit(f"one-pass selection differs from the reference for pool {seed}")
+        expected_label = reference_select(trains)[1]
+        _, label = get_trains_by_logic([dict(t) for t in trains], tz)
+        if not (label == expected_label or (expected_label == "local" and label == "local_fallback")):
+            sys.exit(f"get_trains_by_logic chose {label!r}, reference chose {expected_label!r}")
+
+
+def best_of(func, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    check_equivalence()
+    print("equivalence ok")
+
+    # Only local/unknown trains: the reference has to scan every train for
+    # non-local keywords before it finds a local one
+    trains = synthetic_trains(n, ["BWN MEMU", "DHN PASSENGER", "COALFIELD"], ["memu", "pass", ""])
+    mixed = synthetic_trains(n)
+
+    print(f"{n} synthetic trains, best of {repeats}")
+    classify = best_of(lambda: [classify_train(t['train_name'], t['train_type']) for t in trains], repeats)
+    print(f"  classify at parse time     {classify * 1000:8.2f} ms (once per timetable)")
+    for label, data in (("local-only", trains), ("mixed", mixed)):
+        old = best_of(lambda: reference_select(data), repeats)
+        new = best_of(lambda: one_pass_select(data), repeats)
+        print(f"  {label:<10} keyword scans {old * 1000:8.2f} ms   one pass {new * 1000:8.2f} ms per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Columnar timetables versus selection over per-train dicts.
+
+First a randomised parity check: for many random timetables select_departures
+over TimetableColumns must select exactly what it selects over the dicts with
+a DepartureIndex, and the booking-class filter must match a scan of the
+dicts. Then, for a large timetable, reports the memory per train of each
+representation (tracemalloc) and the latency of the "next trains" selection
+and of "next 3 bookable in class X" queries for a common, a rare and an
+absent class.
+
+    python benchmarks/bench_columns.py [trains] [cases]
+"""
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emergency_scraper import (BOOKING_CLASSES, BOTH, LOCAL, NON_LOCAL, UNKNOWN, DepartureIndex,
+                               TimetableColumns, select_departures)
+from train_record import to_records
+
+CATEGORY_MIXES = [[NON_LOCAL, LOCAL, BOTH, UNKNOWN], [NON_LOCAL, UNKNOWN], [LOCAL, UNKNOWN], [BOTH], [UNKNOWN]]
+ODD_TIMES = ["", "25:00", "12:75", "5:07", "ab:cd"]
+
+
+def random_trains(rng, n, categories):
+    trains = []
+    for i in range(n):
+        if rng.random() < 0.05:
+            departure_time = rng.choice(ODD_TIMES)
+        else:
+            departure_time = f"{rng.randrange(24):02d}:{rng.randrange(60):02d}"
+        trains.append({
+            'train_number': f"{rng.randrange(10000, 99999)}",
+            'train_name': "TRAIN",
+            'train_type': "exp",
+            'source': "HWH",
+            'departure_time': departure_time,
+            'destination': "BWN",
+            'arrival_time': f"{rng.randrange(24):02d}:{rng.randrange(60):02d}",
+            'duration': f"{rng.randrange(3):02d}:{rng.randrange(60):02d}H",
+            'booking_available': True,
+            'advance_reservation_period': "120",
+            'start_date': "",
+            'end_date': "",
+            'booking_classes': sorted(rng.sample(BOOKING_CLASSES[:8] + ("XX",), rng.randrange(0, 5))),
+            'notices': [],
+            'has_pantry': False,
+            'is_limited_run': False,
+            'category': rng.choice(categories),
+        })
+    return trains
+
+
+def random_now(rng):
+    now = datetime(2025, 6, 29) + timedelta(minutes=rng.randrange(24 * 60))
+    if rng.random() < 0.7:
+        now = now.replace(second=rng.randrange(60), microsecond=rng.randrange(1_000_000))
+    return now
+
+
+def check_parity(cases, seed=13):
+    rng = random.Random(seed)
+    for case in range(cases):
+        trains = random_trains(rng, rng.randrange(0, 80), rng.choice(CATEGORY_MIXES))
+        columns = TimetableColumns(to_records(trains))
+        index = DepartureIndex(trains)
+        now = random_now(rng)
+        k = rng.choice([1, 3, 10])
+        expected = select_departures(trains, now, k, index=index)
+        actual = select_departures(trains, now, k, index=columns)
+        if actual != expected:
+            sys.exit(f"case {case} at {now}: columns selected {actual}, dicts selected {expected}")
+
+        booking_class = rng.choice(BOOKING_CLASSES[:8] + ("XX",))
+        expected = index.first(now, k, lambda p: booking_class in trains[p]['booking_classes'])
+        if booking_class not in BOOKING_CLASSES:
+            expected = []  # unlisted classes cannot be filtered on
+        if columns.first(now, k, booking_class=booking_class) != expected:
+            sys.exit(f"case {case} at {now}: booking class {booking_class} filter differs")
+
+
+def retained(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def best_of(func, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    cases = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+
+    check_parity(cases)
+    print(f"parity ok: {cases} random timetables")
+
+    rng = random.Random(5)
+    trains = random_trains(rng, n, [NON_LOCAL, UNKNOWN])
+    for train in trains[::1000]:
+        train['booking_classes'].append('FC')  # a class one train in a thousand has
+    index, index_size = retained(lambda: DepartureIndex(trains))
+    records, records_size = retained(lambda: to_records(trains))
+    columns, columns_size = retained(lambda: TimetableColumns(records))
+    print(f"{n} trains, memory per train (tracemalloc)")
+    print(f"  DepartureIndex        {index_size / n:6.1f} bytes  (alongside the dicts)")
+    print(f"  TimetableColumns      {columns_size / n:6.1f} bytes  (alongside {records_size / n:.0f} bytes of TrainRecord)")
+
+    now = random_now(rng)
+    timings = [
+        ("next 3 non-local", lambda: select_departures(trains, now, index=index),
+         lambda: select_departures(records, now, index=columns)),
+        ("next 3 with 3A", lambda: index.first(now, 3, lambda p: '3A' in trains[p]['booking_classes']),
+         lambda: columns.first(now, 3, booking_class='3A')),
+        ("next 3 with FC", lambda: index.first(now, 3, lambda p: 'FC' in trains[p]['booking_classes']),
+         lambda: columns.first(now, 3, booking_class='FC')),
+        ("next 3 with VS", lambda: index.first(now, 3, lambda p: 'VS' in trains[p]['booking_classes']),
+         lambda: columns.first(now, 3, booking_class='VS')),
+    ]
+    results = [(name, best_of(old), best_of(new)) for name, old, new in timings]
+    print("query latency, best of 5")
+    for name, old, new in results:
+        print(f"  {name:<18} dicts {old * 1000:8.3f} ms   columns {new * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Cost and thread safety of the hot-path metrics.
+
+Checks that histogram and counter updates from many threads at once are
+all counted and that the text exposition is well formed (cumulative
+buckets ending in +Inf == _count), then reports the per-call cost of
+Histogram.observe, Histogram.time and Counter.inc.
+
+    python benchmarks/bench_metrics.py [calls]
+"""
+import os
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import metrics
+
+SAMPLE = re.compile(r'^[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? -?[0-9.e+-]+$')
+
+
+def check_threads(threads=8, calls=50_000):
+    histogram = metrics.Histogram('bench_seconds', 'Benchmark histogram.', labels=('stage',))
+    counter = metrics.Counter('bench_total', 'Benchmark counter.', labels=('kind',))
+
+    def work(i):
+        for j in range(calls):
+            histogram.observe((j % 100) / 1000, 'work')
+            counter.inc('odd' if i % 2 else 'even')
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    lines = histogram.render() + counter.render()
+    for line in lines:
+        if not line.startswith('#') and not SAMPLE.match(line):
+            sys.exit(f"malformed exposition line: {line!r}")
+    buckets = [int(line.rsplit(' ', 1)[1]) for line in lines if line.startswith('bench_seconds_bucket')]
+    count = int(next(line for line in lines if line.startswith('bench_seconds_count')).rsplit(' ', 1)[1])
+    if buckets != sorted(buckets) or buckets[-1] != count or count != threads * calls:
+        sys.exit(f"histogram lost updates: {count} of {threads * calls}")
+    if sum(int(line.rsplit(' ', 1)[1]) for line in lines if line.startswith('bench_total{')) != threads * calls:
+        sys.exit("counter lost updates")
+    metrics.REGISTRY.remove(histogram)
+    metrics.REGISTRY.remove(counter)
+
+
+def per_call(func, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    check_threads()
+    print("thread safety ok: no lost updates, exposition well formed")
+
+    def timed():
+        with metrics.STAGE_SECONDS.time('bench'):
+            pass
+
+    print(f"per call, {calls} calls")
+    for label, func in (("Histogram.observe", lambda: metrics.STAGE_SECONDS.observe(0.003, 'bench')),
+                        ("Histogram.time", timed),
+                        ("Counter.inc", lambda: metrics.UPSTREAM_ERRORS.inc('bench'))):
+        print(f"  {label:<18} {per_call(func, calls) * 1e9:6.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
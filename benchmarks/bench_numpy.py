@@ -0,0 +1,108 @@
+"""NumPy departure index versus the pure-Python DepartureIndex.
+
+Checks that VectorDepartureIndex selects exactly what DepartureIndex
+selects (random "now", malformed times, filtered and unfiltered top-k,
+the one-hour window) and that build_departure_index falls back to pure
+Python without NumPy, then times building and querying both for
+whole-division sized batches. The NumPy index builds much faster, so it
+wins for one-off selections; the sorted pure-Python index answers
+repeated queries faster, which is why cached routes keep using it.
+
+    python benchmarks/bench_numpy.py [sizes]     e.g. 1000,10000,100000
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import emergency_scraper
+from emergency_scraper import DepartureIndex, build_departure_index
+
+if emergency_scraper.np is None:
+    sys.exit("NumPy is not installed; only the pure-Python index is available")
+
+from emergency_scraper import VectorDepartureIndex
+
+ODD_TIMES = ["", "25:00", "12:75", "5:07", " 9:30", "05:07:00", "ab:cd", "7", None]
+
+
+def random_trains(rng, n):
+    trains = []
+    for i in range(n):
+        if rng.random() < 0.03:
+            departure_time = rng.choice(ODD_TIMES)
+        else:
+            departure_time = f"{rng.randrange(24):02d}:{rng.randrange(60):02d}"
+        trains.append({'train_number': str(i), 'departure_time': departure_time, 'category': rng.choice('ab')})
+    return trains
+
+
+def random_now(rng):
+    now = datetime(2025, 6, 29) + timedelta(minutes=rng.randrange(24 * 60))
+    if rng.random() < 0.7:
+        now = now.replace(second=rng.randrange(60), microsecond=rng.randrange(1_000_000))
+    return now
+
+
+def check_parity(cases=300, seed=5):
+    rng = random.Random(seed)
+    for case in range(cases):
+        trains = random_trains(rng, rng.randrange(0, 400))
+        python_index, vector_index = DepartureIndex(trains), VectorDepartureIndex(trains)
+        accept = lambda p: trains[p]['category'] == 'a'
+        for _ in range(5):
+            now = random_now(rng)
+            k = rng.choice([1, 3, 10, 1000])
+            for name, args in (("first", (now, k)), ("first filtered", (now, k, accept)), ("within", (now, 60))):
+                method = name.split()[0]
+                expected = getattr(python_index, method)(*args)
+                actual = getattr(vector_index, method)(*args)
+                if actual != expected:
+                    sys.exit(f"case {case}: {name} at {now} differs: {actual[:5]} vs {expected[:5]}")
+
+    saved = emergency_scraper.np
+    emergency_scraper.np = None
+    try:
+        if not isinstance(build_departure_index(random_trains(rng, 10_000)), DepartureIndex):
+            sys.exit("build_departure_index did not fall back to DepartureIndex without NumPy")
+    finally:
+        emergency_scraper.np = saved
+
+
+def best_of(func, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sizes = [int(size) for size in (sys.argv[1] if len(sys.argv) > 1 else "1000,10000,100000").split(",")]
+
+    check_parity()
+    print("parity ok: VectorDepartureIndex matches DepartureIndex; pure-Python fallback ok")
+
+    rng = random.Random(9)
+    now = random_now(rng)
+    for n in sizes:
+        trains = random_trains(rng, n)
+        accept = lambda p: trains[p]['category'] == 'a'
+        print(f"{n} trains")
+        for name, cls in (("python", DepartureIndex), ("numpy", VectorDepartureIndex)):
+            index = cls(trains)
+            build = best_of(lambda: cls(trains), 3)
+            first = best_of(lambda: index.first(now, 3))
+            filtered = best_of(lambda: index.first(now, 3, accept))
+            within = best_of(lambda: index.within(now, 60))
+            print(f"  {name:<7} build {build * 1000:8.2f} ms   next 3 {first * 1000:7.3f} ms   "
+                  f"next 3 filtered {filtered * 1000:7.3f} ms   within 1h {within * 1000:7.3f} ms   "
+                  f"one-off build + next 3 {(build + first) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Parse cost and output parity of the HTML parser backends.
+
+Every backend must yield the same warning text, get_train_info records
+and get_booking_classes lists for each page; the script exits non-zero
+on any mismatch before timing anything.
+
+    python benchmarks/bench_parse.py [repeats]
+"""
+import glob
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from emergency_scraper import PARSER_BACKENDS, get_booking_classes, get_train_info, parse_page
+
+PAGES_DIR = os.path.join(ROOT, "benchmarks", "pages")
+
+def extract(html, backend):
+    soup = parse_page(html, backend)
+    warn = soup.find('div', class_='warn')
+    rows = soup.find_all('tr', attrs={'data-train': True})
+    return (
+        warn.get_text(strip=True) if warn else None,
+        [get_train_info(row) for row in rows],
+        [get_booking_classes(row) for row in rows],
+    )
+
+
+def load_pages():
+    pages = {}
+    # The recorded corpus: small route, corridors, a station-code warning and a 404 page
+    for path in sorted(glob.glob(os.path.join(PAGES_DIR, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+
+def check_parity(pages):
+    failures = 0
+    for name, html in pages.items():
+        expected = extract(html, "html.parser")
+        for backend in PARSER_BACKENDS:
+            if extract(html, backend) != expected:
+                print(f"MISMATCH: {backend} on {name}")
+                failures += 1
+    return failures
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    pages = load_pages()
+
+    failures = check_parity(pages)
+    if failures:
+        sys.exit(f"{failures} parity failure(s)")
+    print(f"parity ok: {len(PARSER_BACKENDS)} backends x {len(pages)} pages")
+
+    for name, html in pages.items():
+        print(f"{name} ({len(html) // 1024} KB), best of {repeats}")
+        for backend in PARSER_BACKENDS:
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                parse_page(html, backend)
+                best = min(best, time.perf_counter() - start)
+            print(f"  {backend:<12} {best * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Memory footprint of cached trains: get_train_info dicts versus TrainRecords.
+
+Builds N trains from the rows of a saved route page (decoded from JSON
+per train, so that like freshly parsed trains no strings are shared) and
+reports with tracemalloc what a list of N dicts and a list of N
+TrainRecords retain. Before that it checks that records convert back to
+the same dicts, the same /trains/json train data and the same selection and JSON
+output as the dicts they were built from.
+
+    python benchmarks/bench_records.py [trains] [page.html]
+"""
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pytz import timezone
+
+from emergency_api import TrainInfo, train_payload
+from fast_json import dumps
+from emergency_scraper import get_trains_by_logic, parse_trains
+from train_record import TrainRecord, to_records
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+TZ = timezone("Asia/Kolkata")
+
+
+def train_texts(page, n):
+    with open(page, encoding="utf-8") as f:
+        trains = parse_trains(f.read())
+    texts = []
+    for i in range(n):
+        train = dict(trains[i % len(trains)], train_number=f"{i:06d}")
+        texts.append(json.dumps(train, ensure_ascii=False))
+    return texts
+
+
+def check_conversions(texts):
+    dicts = [json.loads(text) for text in texts]
+    records = to_records(dicts)
+    for info, record in zip(dicts, records):
+        if record.as_dict() != info or dict(record) != {**info, 'booking_classes': tuple(info['booking_classes']),
+                                                         'notices': tuple(info['notices'])}:
+            sys.exit(f"record {record!r} does not round-trip to its dict")
+        data, = train_payload([record], "fresh")["data"]
+        if dumps(data) != dumps(train_payload([info], "fresh")["data"][0]) or TrainInfo(**data) != TrainInfo(**info):
+            sys.exit(f"record {record!r} converts to a different TrainInfo")
+
+    for hour in range(0, 24, 3):
+        now = TZ.localize(datetime(2025, 6, 29, hour, 17, 30))
+        expected = get_trains_by_logic(dicts, TZ, now=now)
+        actual = get_trains_by_logic(records, TZ, now=now)
+        if actual != expected or json.dumps(actual[0], default=str) != json.dumps(expected[0], default=str):
+            sys.exit(f"selection over records differs at {now}")
+
+
+def retained(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    page = sys.argv[2] if len(sys.argv) > 2 else os.path.join(PAGES_DIR, "HWH-to-BWN.html")
+
+    texts = train_texts(page, n)
+    check_conversions(texts[:2000])
+    print("conversions ok: records round-trip to dicts, TrainInfo and selections")
+
+    dicts = retained(lambda: [json.loads(text) for text in texts])
+    records = retained(lambda: [TrainRecord.from_info(json.loads(text)) for text in texts])
+    print(f"{n} trains from {os.path.basename(page)} (tracemalloc, retained)")
+    for name, size in (("dicts", dicts), ("TrainRecords", records)):
+        print(f"  {name:<13} {size / 2**20:8.1f} MiB   {size / n:7.0f} bytes/train")
+    print(f"  saved         {(dicts - records) / 2**20:8.1f} MiB   ({1 - records / dicts:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Per-row extraction cost over a saved multi-row route page.
+
+Compares the old double-evaluating list comprehension with the
+single-pass iter_train_info generator.
+
+    python benchmarks/bench_rows.py [page.html] [repeats]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from emergency_scraper import get_train_info, iter_train_info
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+
+def double_pass(train_rows):
+    return [get_train_info(row) for row in train_rows if get_train_info(row)]
+
+
+def single_pass(train_rows):
+    return list(iter_train_info(train_rows))
+
+
+def best_of(func, train_rows, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(train_rows)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    page = sys.argv[1] if len(sys.argv) > 1 else os.path.join(PAGES_DIR, "HWH-to-BWN.html")
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    with open(page, encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+    train_rows = soup.find_all('tr', attrs={'data-train': True})
+
+    if double_pass(train_rows) != single_pass(train_rows):
+        sys.exit("single-pass output differs from double-pass output")
+
+    rows = len(train_rows)
+    print(f"{os.path.basename(page)}: {rows} rows, best of {repeats}")
+    for name, func in (("double pass", double_pass), ("single pass", single_pass)):
+        elapsed = best_of(func, train_rows, repeats)
+        print(f"  {name:<12} {elapsed * 1000:8.2f} ms total  {elapsed / rows * 1e6:8.1f} us/row")
+
+
+if __name__ == "__main__":
+    main()
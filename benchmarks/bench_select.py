@@ -0,0 +1,130 @@
+"""Departure selection: DepartureIndex versus per-request datetimes and a full sort.
+
+First a randomised property check: for many random timetables (duplicate
+and malformed departure times, departures at the current minute, "now"
+on and off exact minutes, every category mix) get_trains_by_logic must
+select the same trains, in the same order and with the same departure
+datetimes, as building a datetime per train and sorting them all. Then
+both are timed on a large timetable.
+
+    python benchmarks/bench_select.py [trains] [cases]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emergency_scraper import BOTH, LOCAL, NON_LOCAL, UNKNOWN, DepartureIndex, get_trains_by_logic
+from pytz import timezone
+
+TZ = timezone("Asia/Kolkata")
+CATEGORY_MIXES = [
+    [NON_LOCAL, LOCAL, BOTH, UNKNOWN],
+    [NON_LOCAL, UNKNOWN],
+    [LOCAL, UNKNOWN],
+    [LOCAL],
+    [BOTH, UNKNOWN],
+    [UNKNOWN],
+]
+MALFORMED_TIMES = ["", "25:00", "12:75", "5:7:0", "ab:cd"]
+
+
+def reference_select(trains, current_time):
+    dated = []
+    for train in trains:
+        try:
+            h, m = map(int, train['departure_time'].split(':'))
+            departure_dt = current_time.replace(hour=h, minute=m, second=0, microsecond=0)
+            if departure_dt < current_time:
+                departure_dt += timedelta(days=1)
+        except ValueError:
+            departure_dt = current_time + timedelta(days=365)
+        dated.append((train, departure_dt))
+
+    dated.sort(key=lambda pair: pair[1])
+    non_locals = [pair for pair in dated if pair[0]['category'] in (NON_LOCAL, BOTH)]
+    has_local = any(pair[0]['category'] in (LOCAL, BOTH) for pair in dated)
+    if non_locals and has_local:
+        return dated[:3], "mixed"
+    if non_locals:
+        return non_locals[:3], "non_local"
+    if has_local:
+        end_time = current_time + timedelta(hours=1)
+        locals_in_1hr = [pair for pair in dated if pair[1] <= end_time]
+        if locals_in_1hr:
+            return locals_in_1hr, "local"
+        return dated[:3], "local_fallback"
+    return dated[:3], "other"
+
+
+def random_now(rng):
+    now = TZ.localize(datetime(2025, 6, 29) + timedelta(minutes=rng.randrange(24 * 60)))
+    if rng.random() < 0.7:
+        now = now.replace(second=rng.randrange(60), microsecond=rng.randrange(1_000_000))
+    return now
+
+
+def random_trains(rng, n, categories, now):
+    now_minute = now.hour * 60 + now.minute
+    # A few candidate minutes around "now" and the one-hour edge force ties and boundary cases
+    candidates = [(now_minute + d) % 1440 for d in (-1, 0, 1, 59, 60, 61)] + [rng.randrange(1440) for _ in range(6)]
+    trains = []
+    for i in range(n):
+        if rng.random() < 0.05:
+            departure_time = rng.choice(MALFORMED_TIMES)
+        else:
+            minute = rng.choice(candidates) if rng.random() < 0.5 else rng.randrange(1440)
+            departure_time = f"{minute // 60:02d}:{minute % 60:02d}"
+        trains.append({'train_number': str(i), 'category': rng.choice(categories), 'departure_time': departure_time})
+    return trains
+
+
+def check_property(cases, seed=11):
+    rng = random.Random(seed)
+    for case in range(cases):
+        now = random_now(rng)
+        trains = random_trains(rng, rng.randrange(0, 60), rng.choice(CATEGORY_MIXES), now)
+        expected, expected_label = reference_select(trains, now)
+        actual, label = get_trains_by_logic(trains, TZ, now=now)
+        expected = [(t['train_number'], dt) for t, dt in expected]
+        actual = [(t['train_number'], t['departure_datetime']) for t in actual]
+        if label != expected_label or actual != expected:
+            sys.exit(f"case {case} at {now}: index selected {label} {actual}, "
+                     f"sorting selected {expected_label} {expected}")
+
+
+def best_of(func, repeats=5):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    cases = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+
+    check_property(cases)
+    print(f"property ok: {cases} random timetables")
+
+    rng = random.Random(3)
+    now = random_now(rng)
+    print(f"{n} trains, best of 5")
+    for categories in ([NON_LOCAL, UNKNOWN], [LOCAL, UNKNOWN]):
+        trains = random_trains(rng, n, categories, now)
+        index = DepartureIndex(trains)
+        full = best_of(lambda: reference_select(trains, now))
+        build = best_of(lambda: DepartureIndex(trains))
+        query = best_of(lambda: get_trains_by_logic(trains, TZ, now=now, index=index))
+        label = "/".join(categories)
+        print(f"  {label:<18} datetimes+sort {full * 1000:8.2f} ms   "
+              f"index build {build * 1000:8.2f} ms (once per route)   query {query * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Serialising /trains/json responses: pydantic models versus plain dicts + orjson,
+and where the rest of a cached request's time goes.
+
+The previous handler returned a TrainResponse model; FastAPI validated it
+against response_model, serialised it with pydantic's (compiled) JSON-mode
+serializer and rendered it with json.dumps. The fast path builds the
+payload as plain dicts and renders it with fast_json.dumps (orjson when
+installed). Checks that both paths produce the same JSON (and that the
+json fallback produces the same bytes as orjson), then times:
+
+- serialisation alone, each path as FastAPI runs it;
+- the other per-request parts of /trains/json for a cached route;
+- whole requests through the ASGI app, called directly so that the
+  HTTP client's own cost (which dominates with httpx) is left out.
+
+    python benchmarks/bench_serialise.py [requests]
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["FETCH_MODE"] = "replay"
+os.environ["TIMETABLE_DB"] = ""
+
+PARAMS = ("Howrah Jn", "HWH", "Barddhaman Jn", "BWN")
+QUERY = b"src_name=Howrah+Jn&src_code=HWH&dst_name=Barddhaman+Jn&dst_code=BWN"
+
+
+def without_timestamp(body):
+    payload = json.loads(body)
+    payload.pop("timestamp")
+    return payload
+
+
+def check_parity(api, fast_json, trains):
+    for selected in (None, [], trains[:3], trains):
+        old = json.dumps(api.build_train_response(selected, "fresh").model_dump(mode="json"))
+        payload = api.train_payload(selected, "fresh")
+        new = fast_json.dumps(payload)
+        if without_timestamp(new) != without_timestamp(old):
+            sys.exit("fast path JSON differs from the pydantic path")
+        saved, fast_json.orjson = fast_json.orjson, None
+        try:
+            fallback = fast_json.dumps(payload)
+        finally:
+            fast_json.orjson = saved
+        if fallback != new:
+            sys.exit("json fallback bytes differ from orjson bytes")
+
+
+async def best_of(func, repeats=5, number=500):
+    """Best time per call of an async func."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+async def call_app(app, path):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": QUERY, "root_path": "",
+        "headers": [(b"host", b"api")], "client": ("127.0.0.1", 50000), "server": ("api", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    if messages[0]["status"] != 200:
+        sys.exit(f"{path} answered {messages[0]['status']}")
+
+
+async def run(total):
+    import emergency_api as api
+    import fast_json
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from tzlocal import get_localzone
+    logging.getLogger().setLevel(logging.WARNING)
+
+    @api.app.get("/bench/pydantic", response_model=api.TrainResponse)
+    async def pydantic_trains_json(src_name: str, src_code: str, dst_name: str, dst_code: str):
+        trains, cache_status = await api.run_scrape(src_name, src_code, dst_name, dst_code)
+        return api.build_train_response(trains, cache_status)
+
+    trains, cache_status = await api.run_scrape(*PARAMS)
+    route = api.route_cache.get(api.route_key(PARAMS[1], PARAMS[3], get_localzone()))
+    check_parity(api, fast_json, list(route.trains))
+    print(f"parity ok: same JSON from both paths (encoder: {fast_json.JSON_BACKEND})")
+
+    field = create_response_field(name="response", type_=api.TrainResponse)
+
+    async def noop():
+        pass
+
+    async def pydantic_path(selected):
+        content = await serialize_response(field=field, response_content=api.build_train_response(selected, "fresh"))
+        return JSONResponse(content).body
+
+    async def fast_path(selected):
+        return fast_json.dumps(api.train_payload(selected, "fresh"))
+
+    overhead = await best_of(noop)
+    print("serialisation only, per response")
+    for label, selected in (("next 3 trains", trains), (f"all {len(route.trains)} trains", list(route.trains))):
+        old = await best_of(lambda: pydantic_path(selected)) - overhead
+        new = await best_of(lambda: fast_path(selected)) - overhead
+        print(f"  {label:<16} pydantic {old * 1e6:8.1f} us   fast path {new * 1e6:8.1f} us")
+
+    async def etag_and_cache_control():
+        api.selection_etag(trains)
+        api.route_cache_control(PARAMS[1], PARAMS[3], cache_status)
+        api.route_key(PARAMS[1], PARAMS[3], get_localzone())
+
+    parts = {
+        "route lookup + selection": await best_of(lambda: api.run_scrape(*PARAMS)) - overhead,
+        "ETag + Cache-Control": await best_of(etag_and_cache_control) - overhead,
+    }
+    for path in ("/bench/pydantic", "/trains/json"):
+        await call_app(api.app, path)
+    request = {path: await best_of(lambda: call_app(api.app, path), number=total) - overhead
+               for path in ("/bench/pydantic", "/trains/json")}
+    parts["framework (routing, params, middleware)"] = request["/trains/json"] - sum(parts.values())
+
+    print(f"whole requests through the ASGI app, cached route, best of 5 x {total}")
+    for path, seconds in request.items():
+        print(f"  {path:<16} {seconds * 1e6:8.1f} us   ({1 / seconds:6.0f} req/s on one core)")
+    print("  /trains/json breakdown (the body itself comes from the payload cache)")
+    for label, seconds in parts.items():
+        print(f"    {label:<40} {seconds * 1e6:8.1f} us")
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    asyncio.run(run(total))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""Benchmark suite for the fetch, parse, select and serve stages over the
+recorded page corpus, with results saved as JSON and compared between runs.
+
+Cases, per corpus page where it applies:
+
+    build_url                          one route URL
+    parse/<page>                       parse_page (the configured BeautifulSoup backend)
+    get_train_info/<page>              per train row, on an already parsed page
+    get_trains_by_logic/<page>         one-off selection, departure index built on the fly
+    get_trains_by_logic[columns]/<page>  selection over the route's cached TimetableColumns
+    trains_json[cold]/<page>           GET /trains/json with empty caches: replayed fetch,
+                                       parse, select and serialise
+    trains_json[cached]/<page>         GET /trains/json for a cached route
+
+Pages are served by the replay fetcher (FETCH_MODE=replay), so runs are
+offline and repeatable; selection uses a fixed 08:00 clock. Each case
+reports the best and median time per call over several repeats.
+
+    python benchmarks/bench_suite.py [-k filter] [--output results.json]
+                                     [--baseline previous.json] [--threshold 0.25]
+    python benchmarks/bench_suite.py --compare previous.json results.json
+
+With --baseline (or --compare) a case whose best time grew by more than
+the threshold fraction counts as a regression and the exit status is 1.
+Only compare results taken on the same machine.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["FETCH_MODE"] = "replay"
+os.environ.setdefault("REPLAY_DIR", os.path.join(ROOT, "benchmarks", "pages"))
+os.environ["TIMETABLE_DB"] = ""
+
+import httpx
+from tzlocal import get_localzone
+
+import emergency_api as api
+import emergency_scraper
+import fast_json
+from emergency_scraper import (
+    RouteTimetable, build_url, get_train_info, get_trains_by_logic, parse_page, parse_trains,
+)
+from fetcher import REPLAY_DIR
+
+# Corpus routes with trains: (page, src_name, src_code, dst_name, dst_code)
+ROUTES = [
+    ("BWN-to-CRJ", "Barddhaman Jn", "BWN", "Chittaranjan", "CRJ"),
+    ("HWH-to-BWN", "Howrah Jn", "HWH", "Barddhaman Jn", "BWN"),
+    ("CSMT-to-TNA", "Mumbai CSMT", "CSMT", "Thane", "TNA"),
+]
+DEFAULT_THRESHOLD = 0.25
+
+
+def load_corpus():
+    pages = {}
+    for name in sorted(os.listdir(REPLAY_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(REPLAY_DIR, name), encoding="utf-8") as f:
+                pages[name[:-len(".html")]] = f.read()
+    return pages
+
+
+def stage_cases(pages):
+    """(name, func, calls per func() run) for the scraper stages."""
+    local_tz = get_localzone()
+    now = datetime.now(local_tz).replace(hour=8, minute=0, second=0, microsecond=0)
+    cases = [("build_url", lambda: build_url("Howrah Jn", "HWH", "Barddhaman Jn", "BWN", "20250629"), 1)]
+    for name, html in pages.items():
+        cases.append((f"parse/{name}", lambda html=html: parse_page(html), 1))
+    timetables = {}
+    for name, html in pages.items():
+        rows = parse_page(html).find_all("tr", attrs={"data-train": True})
+        if rows:
+            trains = parse_trains(html)
+            timetables[name] = (rows, trains, RouteTimetable(trains))
+    for name, (rows, trains, route) in timetables.items():
+        cases.append((f"get_train_info/{name}", lambda rows=rows: [get_train_info(row) for row in rows], len(rows)))
+    for name, (rows, trains, route) in timetables.items():
+        cases += [
+            (f"get_trains_by_logic/{name}", lambda trains=trains: get_trains_by_logic(trains, local_tz, now=now), 1),
+            (f"get_trains_by_logic[columns]/{name}",
+             lambda route=route: get_trains_by_logic(route.trains, local_tz, now=now, index=route.index), 1),
+        ]
+    return cases
+
+
+def api_cases(loop, client):
+    def request(params, cold):
+        if cold:
+            api.route_cache.clear()
+            api.payload_cache.clear()
+        response = loop.run_until_complete(client.get("/trains/json", params=params))
+        if response.status_code != 200 or not response.json()["success"]:
+            sys.exit(f"/trains/json failed for {params}: {response.status_code}")
+
+    cases = []
+    for page, src_name, src_code, dst_name, dst_code in ROUTES:
+        params = {"src_name": src_name, "src_code": src_code, "dst_name": dst_name, "dst_code": dst_code}
+        cases += [
+            (f"trains_json[cold]/{page}", lambda params=params: request(params, True), 1),
+            (f"trains_json[cached]/{page}", lambda params=params: request(params, False), 1),
+        ]
+    return cases
+
+
+def measure(func, calls, repeats, min_time):
+    # Enough runs per repeat to take min_time, so fast cases are not all timer noise
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    times = [elapsed]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append(time.perf_counter() - start)
+    per_call = [t / (number * calls) for t in times]
+    return {"best": min(per_call), "median": statistics.median(per_call), "runs": number, "repeats": repeats}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(filter_text, repeats, min_time):
+    pages = load_corpus()
+    loop = asyncio.new_event_loop()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://api")
+    cases = stage_cases(pages) + api_cases(loop, client)
+    results = {}
+    try:
+        for name, func, calls in cases:
+            if filter_text and filter_text not in name:
+                continue
+            results[name] = measure(func, calls, repeats, min_time)
+            print(f"  {name:<44} {format_time(results[name]['best'])}  (median {format_time(results[name]['median'])})")
+    finally:
+        loop.run_until_complete(client.aclose())
+        loop.close()
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parser_backend": emergency_scraper.PARSER_BACKEND,
+            "json_backend": fast_json.JSON_BACKEND,
+            "corpus": sorted(pages),
+        },
+        "results": results,
+    }
+
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.2f} us"
+    return f"{seconds * 1e3:9.2f} ms"
+
+
+def compare(baseline, current, threshold):
+    """Print best-time ratios against baseline; returns the regressed case names."""
+    regressions = []
+    print(f"against {baseline['meta'].get('revision') or 'baseline'} "
+          f"({baseline['meta'].get('timestamp')}), threshold +{threshold:.0%}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"  {name:<44} new")
+            continue
+        ratio = result["best"] / before["best"]
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name:<44} {format_time(before['best'])} -> {format_time(result['best'])}  x{ratio:5.2f}{flag}")
+    not_run = [name for name in baseline["results"] if name not in current["results"]]
+    if not_run:
+        print(f"  ({len(not_run)} baseline cases not in these results)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", dest="filter", help="only run cases whose name contains this text")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds each repeat runs at least")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown fraction counted as a regression (default %(default)s)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "RESULTS"),
+                        help="compare two saved result files without running anything")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        logging.getLogger().setLevel(logging.ERROR)
+        print(f"best time per call over {args.repeats} repeats, corpus {REPLAY_DIR}")
+        current = run(args.filter, args.repeats, args.min_time)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+            print(f"saved {len(current['results'])} results to {args.output}")
+        if not args.baseline:
+            return
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        sys.exit(f"{len(regressions)} regression(s) beyond +{args.threshold:.0%}: {', '.join(regressions)}")
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Run the async scraping engine against the local upstream stub.
+
+Checks that scrape_trains_between_async selects the same trains as the
+sync scraper for a saved route and returns None for the 404 page, then
+measures how many concurrent async scrapes complete per second and the
+longest the event loop went unresponsive meanwhile (parsing runs on a
+worker thread, so stalls stay short even when the run is CPU-bound).
+
+    python benchmarks/check_async_engine.py [--delay 0.2] [--concurrency 200]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from upstream_stub import start_stub_server
+
+ROUTE = ("Howrah Jn", "HWH", "Barddhaman Jn", "BWN")
+UNKNOWN_ROUTE = ("Nowhere", "XXX", "Barddhaman Jn", "BWN")
+
+
+async def watch_loop(stalls, interval=0.005):
+    # Records how late each short sleep wakes up: the loop was blocked that long
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+
+def comparable(trains):
+    # departure_datetime embeds "now", which differs between the two runs
+    return [{k: v for k, v in t.items() if k != 'departure_datetime'} for t in trains]
+
+
+async def run_async_checks(scraper, fetcher, concurrency):
+    sync_result = await asyncio.to_thread(scraper.scrape_trains_between, *ROUTE)
+    async_result = await scraper.scrape_trains_between_async(*ROUTE, fetcher=fetcher)
+    if comparable(async_result) != comparable(sync_result):
+        sys.exit("async engine selected different trains than the sync scraper")
+    if await scraper.scrape_trains_between_async(*UNKNOWN_ROUTE, fetcher=fetcher) is not None:
+        sys.exit("async engine did not reject the 404 page")
+
+    stalls = []
+    watcher = asyncio.create_task(watch_loop(stalls))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        scraper.scrape_trains_between_async(*ROUTE, fetcher=fetcher) for _ in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    watcher.cancel()
+    await fetcher.close()
+    if any(result is None for result in results):
+        sys.exit("some concurrent async scrapes failed")
+    return elapsed, max(stalls, default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+
+    base_url, stop = start_stub_server(delay=args.delay)
+    os.environ["ETRAIN_BASE_URL"] = base_url
+    os.environ["TIMETABLE_DB"] = ""
+
+    import emergency_scraper
+    from fetcher import AsyncPooledFetcher
+
+    fetcher = AsyncPooledFetcher(pool_size=args.concurrency, max_per_host=args.concurrency)
+    try:
+        elapsed, stall = asyncio.run(run_async_checks(emergency_scraper, fetcher, args.concurrency))
+    finally:
+        stop()
+
+    print("parity ok: async engine matches the sync scraper")
+    print(f"{args.concurrency} concurrent async scrapes in {elapsed:.2f} s "
+          f"({args.concurrency / elapsed:.1f} req/s, upstream delay {args.delay * 1000:.0f} ms)")
+    print(f"longest event loop stall {stall * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
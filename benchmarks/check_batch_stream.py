@@ -0,0 +1,111 @@
+"""First-byte latency of POST /trains/batch, buffered versus NDJSON streaming.
+
+Runs the API and the upstream stub on local ports. One route is warmed
+into the route cache; the batch then asks for it together with a number
+of uncached routes, which go upstream BATCH_CONCURRENCY at a time. The
+buffered response arrives only when the slowest route is done; with
+stream=true the cached route's line should arrive almost at once. Also
+checks that both modes return the same results, and that an incomplete
+query sharing its codes with a valid one fails on its own.
+
+    python benchmarks/check_batch_stream.py [--delay 0.2] [--routes 12]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from upstream_stub import serve_app, start_stub_server
+
+PAGE = "HWH-to-BWN.html"
+
+
+def route(src_code):
+    return {"src_name": "Station", "src_code": src_code, "dst_name": "Barddhaman Jn", "dst_code": "BWN"}
+
+
+def comparable(result):
+    # The two runs ask for different uncached routes so that both go upstream
+    return {k: v for k, v in result.items() if k not in ("timestamp", "cache_status", "src_code")}
+
+
+def run_batch(client, api_url, routes, stream):
+    start = time.perf_counter()
+    first_byte = None
+    lines = []
+    with client.stream("POST", f"{api_url}/trains/batch", params={"stream": stream}, json={"routes": routes}) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            if line:
+                lines.append(line)
+    total = time.perf_counter() - start
+    if stream:
+        results = sorted((json.loads(line) for line in lines), key=lambda result: result["index"])
+    else:
+        results = json.loads("".join(lines))["results"]
+    return first_byte, total, results
+
+
+def check_invalid_duplicates(client, api_url):
+    # The incomplete query must not decide the valid one's result, in either order
+    invalid = dict(route("WARM"), src_name=" ")
+    for routes in ([invalid, route("WARM")], [route("WARM"), invalid]):
+        for stream in (False, True):
+            statuses = [r["status"] for r in run_batch(client, api_url, routes, stream)[2]]
+            expected = ["error" if r is invalid else "ok" for r in routes]
+            if statuses != expected:
+                sys.exit(f"batch of an invalid and a valid query for one route returned {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--routes", type=int, default=12)
+    args = parser.parse_args()
+
+    stub_url, stop_stub = start_stub_server(delay=args.delay, default_page=PAGE)
+    os.environ["ETRAIN_BASE_URL"] = stub_url
+    os.environ["TIMETABLE_DB"] = ""
+    os.environ.setdefault("BATCH_CONCURRENCY", "4")
+
+    import httpx
+    from emergency_api import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    api_url, stop_api = serve_app(app)
+    try:
+        with httpx.Client(timeout=120) as client:
+            client.post(f"{api_url}/trains/batch", json={"routes": [route("WARM")]}).raise_for_status()
+            timings = {}
+            for stream in (False, True):
+                routes = [route("WARM")] + [route(f"C{stream:d}X{i}") for i in range(args.routes - 1)]
+                timings[stream] = run_batch(client, api_url, routes, stream)
+            check_invalid_duplicates(client, api_url)
+    finally:
+        stop_api()
+        stop_stub()
+
+    buffered, streamed = timings[False][2], timings[True][2]
+    if [comparable(r) for r in buffered] != [comparable(r) for r in streamed]:
+        sys.exit("streamed results differ from the buffered response")
+    if [r["index"] for r in streamed] != list(range(args.routes)):
+        sys.exit("streamed results do not cover every query exactly once")
+    print("parity ok: streamed lines match the buffered results; invalid queries fail on their own")
+
+    print(f"{args.routes} routes (1 cached), upstream delay {args.delay * 1000:.0f} ms, "
+          f"BATCH_CONCURRENCY {os.environ['BATCH_CONCURRENCY']}")
+    for stream, label in ((False, "buffered"), (True, "ndjson stream")):
+        first_byte, total, _ = timings[stream]
+        print(f"  {label:<14} first byte {first_byte * 1000:7.1f} ms   complete {total * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
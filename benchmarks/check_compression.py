@@ -0,0 +1,124 @@
+"""Response compression: negotiation, thresholds, streams and cached variants.
+
+Runs the API in-process against the upstream stub and checks that:
+  - /trains/json bodies over COMPRESS_MIN_SIZE are compressed with the
+    best encoding the client accepts and decompress to the identity body,
+  - a hot route's compressed body is produced once and then reused,
+  - batch responses are compressed by the middleware, NDJSON and SSE
+    streams and small bodies are not, and q=0 / identity are honoured.
+Then compares the cost of compressing a body on every request with
+serving its cached compressed variant.
+
+    python benchmarks/check_compression.py
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from upstream_stub import start_stub_server
+
+PARAMS = {"src_name": "Howrah Jn", "src_code": "HWH", "dst_name": "Barddhaman Jn", "dst_code": "BWN"}
+MIN_SIZE = 256
+
+
+def route(src_code):
+    return {"src_name": "Station", "src_code": src_code, "dst_name": "Barddhaman Jn", "dst_code": "BWN"}
+
+
+async def run_checks(api, compression):
+    import httpx
+
+    calls = []
+    compress = compression.compress
+
+    def counting_compress(body, encoding):
+        calls.append(encoding)
+        return compress(body, encoding)
+
+    compression.compress = counting_compress
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.app.router.lifespan_context(api.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://api", timeout=30) as client:
+
+        async def get(path, encoding, **kwargs):
+            headers = {"Accept-Encoding": encoding}
+            response = await client.request(kwargs.pop("method", "GET"), path, headers=headers, **kwargs)
+            response.raise_for_status()
+            return response
+
+        identity = await get("/trains/json", "identity", params=PARAMS)
+        if "content-encoding" in identity.headers or identity.headers.get("vary") != "Accept-Encoding":
+            sys.exit("identity request was compressed or lacks Vary")
+        del calls[:]
+        gzipped = [await get("/trains/json", "gzip, deflate", params=PARAMS) for _ in range(5)]
+        if any(r.headers.get("content-encoding") != "gzip" for r in gzipped):
+            sys.exit("/trains/json was not gzip-encoded")
+        if any(r.content != identity.content for r in gzipped):
+            sys.exit("gzip body does not decompress to the identity body")
+        if calls != ["gzip"]:
+            sys.exit(f"hot route compressed {len(calls)} times, expected once")
+        if (await get("/trains/json", "gzip;q=0, br;q=0", params=PARAMS)).headers.get("content-encoding"):
+            sys.exit("q=0 encodings were used")
+
+        batch = {"routes": [route("HWH"), route("CPR"), route("BDC"), route("SHE")]}
+        response = await get("/trains/batch", "gzip", method="POST", json=batch)
+        if response.headers.get("content-encoding") != "gzip":
+            sys.exit("batch response was not compressed by the middleware")
+        streamed = await get("/trains/batch", "gzip", method="POST", json=batch, params={"stream": "true"})
+        if "content-encoding" in streamed.headers:
+            sys.exit("NDJSON stream was compressed (and so buffered)")
+        if "content-encoding" in (await get("/", "gzip")).headers:
+            sys.exit("a body under the threshold was compressed")
+        batch_sizes = (len(response.content), int(response.headers["content-length"]))
+
+        big_batch = {"routes": [route(f"R{i}") for i in range(20)]}
+        big = (await get("/trains/batch", "identity", method="POST", json=big_batch)).content
+    compression.compress = compress
+    return identity.content, big, batch_sizes
+
+
+def best_of(func, repeats=5, number=200):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def main():
+    stub_url, stop = start_stub_server(default_page="HWH-to-BWN.html")
+    os.environ["ETRAIN_BASE_URL"] = stub_url
+    os.environ["TIMETABLE_DB"] = ""
+    os.environ["COMPRESS_MIN_SIZE"] = str(MIN_SIZE)
+
+    import emergency_api as api
+    import response_compression as compression
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        small, big, batch_sizes = asyncio.run(run_checks(api, compression))
+    finally:
+        stop()
+
+    print(f"compression ok (encodings available: {', '.join(compression.ENCODINGS)})")
+    print(f"  batch of 4 routes {batch_sizes[0]} -> {batch_sizes[1]} bytes (middleware)")
+    print("per response: gzip on every request versus the cached EncodedBody variant")
+    for label, body in (("/trains/json", small), ("batch of 20 routes", big)):
+        encoded = compression.EncodedBody(body)
+        encoded.encode("gzip")
+        every_time = best_of(lambda: compression.compress(body, "gzip"))
+        cached = best_of(lambda: encoded.encode("gzip"))
+        print(f"  {label:<19} {len(body):6d} -> {len(encoded.encode('gzip')[0]):5d} bytes   "
+              f"compress {every_time * 1e6:7.1f} us   cached {cached * 1e6:5.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Conditional GET on /trains/json: ETag, Cache-Control and 304 Not Modified.
+
+Warms a route through the ASGI app, then checks that:
+  - a 200 carries a weak ETag and a Cache-Control max-age no longer than
+    the route cache TTL or the time left to the next minute,
+  - repeating the request with If-None-Match gets an empty 304 with the
+    same ETag (also for a list of tags and for *), and a stale tag a 200,
+  - the ETag changes when the selected trains change.
+Then compares the cost of repeat polls answered with 200 and with 304.
+
+    python benchmarks/check_conditional_get.py [requests]
+"""
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from upstream_stub import start_stub_server
+
+PARAMS = {"src_name": "Howrah Jn", "src_code": "HWH", "dst_name": "Barddhaman Jn", "dst_code": "BWN"}
+
+
+async def run_checks(api, total):
+    import httpx
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.app.router.lifespan_context(api.app), \
+            httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+        first = await client.get("/trains/json", params=PARAMS)
+        first.raise_for_status()
+        etag = first.headers.get("etag", "")
+        if not re.fullmatch(r'W/"[0-9a-f]{24}"', etag):
+            sys.exit(f"missing or malformed ETag: {etag!r}")
+        max_age = int(re.fullmatch(r"public, max-age=(\d+)", first.headers["cache-control"]).group(1))
+        if max_age > min(api.route_cache.ttl, 60):
+            sys.exit(f"max-age {max_age} outlives the route cache TTL or the current minute")
+
+        for tag in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+            response = await client.get("/trains/json", params=PARAMS, headers={"If-None-Match": tag})
+            if response.status_code != 304 or response.content or response.headers.get("etag") != etag:
+                sys.exit(f"If-None-Match {tag!r} got {response.status_code}, expected an empty 304")
+        response = await client.get("/trains/json", params=PARAMS, headers={"If-None-Match": '"other"'})
+        if response.status_code != 200:
+            sys.exit("a non-matching If-None-Match did not get the full response")
+
+        timings = {}
+        for label, headers in (("200 OK", {}), ("304 Not Modified", {"If-None-Match": etag})):
+            sent = 0
+            start = time.perf_counter()
+            for _ in range(total):
+                response = await client.get("/trains/json", params=PARAMS, headers=headers)
+                sent += len(response.content)
+            timings[label] = (total / (time.perf_counter() - start), sent / total)
+        return first.json()["data"], timings
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    stub_url, stop = start_stub_server()
+    os.environ["ETRAIN_BASE_URL"] = stub_url
+    os.environ["TIMETABLE_DB"] = ""
+
+    import emergency_api as api
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        trains, timings = asyncio.run(run_checks(api, total))
+    finally:
+        stop()
+
+    tags = {api.selection_etag(trains), api.selection_etag(trains[:2]), api.selection_etag(trains[1:]),
+            api.selection_etag([]), api.selection_etag(None),
+            api.selection_etag([dict(trains[0], booking_classes=["1A", "XX"])] + trains[1:])}
+    if len(tags) != 6:
+        sys.exit("different selections share an ETag")
+    print("conditional GET ok: ETag, Cache-Control, 304 on match, new ETag on a new selection")
+
+    print(f"repeat polls of a cached route, {total} requests")
+    for label, (rps, size) in timings.items():
+        print(f"  {label:<17} {rps:8.0f} req/s   {size:6.0f} body bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Shared live departure boards behind GET /trains/stream.
+
+Connects many SSE clients to one route through the API (served over a
+real socket, upstream stub behind it) and checks that they all receive
+the same "departures" event while the upstream is fetched only once.
+Then drives a DepartureBoard with a fast tick and a scripted selection
+to check that subscribers get a new event only when the selection
+changes, and that the board stops once its last subscriber leaves.
+
+    python benchmarks/check_departure_board.py [--viewers 50]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from upstream_stub import serve_app, start_stub_server
+
+PARAMS = {"src_name": "Howrah Jn", "src_code": "HWH", "dst_name": "Barddhaman Jn", "dst_code": "BWN"}
+
+
+async def first_event(client, api_url):
+    async with client.stream("GET", f"{api_url}/trains/stream", params=PARAMS) as response:
+        response.raise_for_status()
+        event = {}
+        async for line in response.aiter_lines():
+            if not line:
+                return event
+            field, _, value = line.partition(": ")
+            event[field] = value
+
+
+async def many_viewers(api_url, viewers):
+    import httpx
+
+    limits = httpx.Limits(max_connections=viewers)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        start = time.perf_counter()
+        events = await asyncio.gather(*(first_event(client, api_url) for _ in range(viewers)))
+        elapsed = time.perf_counter() - start
+        fetcher = (await client.get(f"{api_url}/stats/fetcher")).json()
+        await asyncio.sleep(0.2)  # let the server notice the closed streams
+        boards = (await client.get(f"{api_url}/stats/cache")).json()["departure_boards"]
+    return events, elapsed, fetcher, boards
+
+
+async def scripted_board():
+    import departure_board
+
+    departure_board.seconds_to_next_minute = lambda: 0.01
+    states = iter(["A", "A", "A", "B", "B"])
+    state = "A"
+
+    async def select():
+        nonlocal state
+        state = next(states, state)
+        return f"board {state}", state
+
+    registry = departure_board.BoardRegistry()
+    received = []
+    events = registry.events("route", select, heartbeat=0.05)
+    async for event in events:
+        if event.startswith("id: "):
+            received.append(event.splitlines()[2])
+        if len(received) == 2:
+            break
+    await asyncio.sleep(0.1)
+    await events.aclose()
+    return received, registry.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--viewers", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    stub_url, stop_stub = start_stub_server(delay=args.delay)
+    os.environ["ETRAIN_BASE_URL"] = stub_url
+    os.environ["TIMETABLE_DB"] = ""
+
+    from emergency_api import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    api_url, stop_api = serve_app(app)
+    try:
+        events, elapsed, fetcher, boards = asyncio.run(many_viewers(api_url, args.viewers))
+    finally:
+        stop_api()
+        stop_stub()
+
+    if any(event.get("event") != "departures" or event.get("data") != events[0].get("data") for event in events):
+        sys.exit("viewers did not all receive the same departures event")
+    if not json.loads(events[0]["data"])["data"]:
+        sys.exit("the departures event has no trains")
+    if fetcher["requests"] != 1:
+        sys.exit(f"{args.viewers} viewers caused {fetcher['requests']} upstream fetches")
+    if boards["subscribers"] != 0:
+        sys.exit(f"boards still count {boards['subscribers']} subscribers after every viewer left")
+    print(f"shared board ok: {args.viewers} viewers, 1 upstream fetch, first events in {elapsed * 1000:.0f} ms")
+
+    received, stats = asyncio.run(scripted_board())
+    if received != ["data: board A", "data: board B"]:
+        sys.exit(f"board published {received}, expected one event per change")
+    if stats["routes"] != 0:
+        sys.exit("board kept running after its last subscriber left")
+    print("change detection ok: unchanged selections are not re-sent")
+
+
+if __name__ == "__main__":
+    main()
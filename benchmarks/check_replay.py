@@ -0,0 +1,134 @@
+"""Check the offline replay fetcher and the recorder against the upstream stub.
+
+Every corpus route must parse to the same trains whether its page is
+replayed from disk or fetched over HTTP from the stub (None for the
+warn and 404 pages); pages recorded through RecordingFetcher must
+replay byte for byte, error status included, and a page recorded for a
+date must win over the route's undated page. Then times the page fetch
+per route both ways.
+
+    python benchmarks/check_replay.py [repeats]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ["TIMETABLE_DB"] = ""
+
+import requests
+
+import emergency_scraper
+from emergency_scraper import build_url, parse_trains
+from fetcher import AsyncReplayFetcher, PooledFetcher, RecordingFetcher, ReplayFetcher, replay_key
+from upstream_stub import start_stub_server
+
+ROUTES = [
+    ("Barddhaman Jn", "BWN", "Chittaranjan", "CRJ"),
+    ("Howrah Jn", "HWH", "Barddhaman Jn", "BWN"),
+    ("Mumbai CSMT", "CSMT", "Thane", "TNA"),
+    ("Howrah Jn", "HWH", "Nowhere", "XYZ"),
+    ("Howrah Jn", "HWH", "Unknown", "ZZZ"),
+]
+DATE = "20250629"
+
+
+def fetch_and_parse(fetcher, url):
+    try:
+        return parse_trains(fetcher.get(url))
+    except requests.HTTPError:
+        return None
+
+
+def check_parity(replay, live, base_url):
+    for route in ROUTES:
+        path = build_url(*route, DATE)[len(emergency_scraper.ETRAIN_BASE_URL):]
+        replayed = fetch_and_parse(replay, emergency_scraper.ETRAIN_BASE_URL + path)
+        fetched = fetch_and_parse(live, base_url + path)
+        if replayed != fetched:
+            sys.exit(f"replay differs from the stub for {replay_key(path)[0]}")
+        count = "None" if replayed is None else f"{len(replayed)} trains"
+        print(f"  {replay_key(path)[0]:<12} {count}")
+    asyncio.run(check_async(replay.directory))
+
+
+async def check_async(directory):
+    fetcher = AsyncReplayFetcher(directory)
+    url = build_url(*ROUTES[0], DATE)
+    if await fetcher.get(url) != ReplayFetcher(directory).get(url):
+        sys.exit("async replay returned a different page")
+
+
+def check_recording(live, base_url):
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = RecordingFetcher(live, directory)
+        urls = [base_url + build_url(*route, DATE)[len(emergency_scraper.ETRAIN_BASE_URL):] for route in ROUTES]
+        bodies = {}
+        for url in urls:
+            try:
+                bodies[url] = (200, recorder.get(url))
+            except requests.HTTPError as e:
+                bodies[url] = (e.response.status_code, e.response.text)
+        if sorted(os.listdir(directory))[-1] != f"HWH-to-ZZZ.{DATE}.404.html":
+            sys.exit(f"404 page not recorded with its status: {sorted(os.listdir(directory))}")
+
+        replay = ReplayFetcher(directory)
+        for url, (status, body) in bodies.items():
+            try:
+                replayed = (200, replay.get(url))
+            except requests.HTTPError as e:
+                replayed = (e.response.status_code, e.response.text)
+            if replayed != (status, body):
+                sys.exit(f"recorded page for {url} did not replay as fetched")
+        try:
+            replay.get(base_url + build_url(*ROUTES[0], "20250630")[len(emergency_scraper.ETRAIN_BASE_URL):])
+        except requests.HTTPError:
+            pass
+        else:
+            sys.exit("a page recorded for one date was replayed for another")
+
+        # A dated page is preferred over the undated one for its date only
+        with open(os.path.join(directory, "BWN-to-CRJ.html"), "w", encoding="utf-8") as f:
+            f.write("undated")
+        replay = ReplayFetcher(directory)
+        if replay.get(urls[0]) == "undated" or replay.get(urls[0].replace(DATE, "20250630")) != "undated":
+            sys.exit("dated pages are not looked up before undated ones")
+    print(f"recording ok: {len(ROUTES)} pages recorded and replayed, 404 kept with its status")
+
+
+def best_of(func, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    base_url, stop = start_stub_server()
+    live = PooledFetcher()
+    replay = ReplayFetcher()
+    try:
+        print(f"replay parity with the stub ({replay.directory})")
+        check_parity(replay, live, base_url)
+        check_recording(live, base_url)
+
+        print(f"page fetch per route, best of {repeats}")
+        for route in ROUTES[:3]:
+            path = build_url(*route, DATE)[len(emergency_scraper.ETRAIN_BASE_URL):]
+            replayed = best_of(lambda: replay.get(emergency_scraper.ETRAIN_BASE_URL + path), repeats)
+            fetched = best_of(lambda: live.get(base_url + path), repeats)
+            print(f"  {replay_key(path)[0]:<12} stub over HTTP {fetched * 1000:8.2f} ms   replay {replayed * 1e6:8.1f} us")
+    finally:
+        live.close()
+        stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Check the API's route cache: TTL, stale grace, LRU eviction and counters,
+coalescing of concurrent loads and background refresh of stale routes.
+
+RouteCache runs on a fake clock, so expiry is checked exactly: an entry
+is fresh for ttl seconds, stale for stale_grace more, then a miss that
+drops it; the least recently used entry is evicted at maxsize; hits,
+stale hits, misses and evictions are counted as they happen.
+
+SingleFlight must run one load for N concurrent callers of a key
+(coalesced == N-1), keep that load going when a waiter is cancelled,
+and hand a failure to every waiter without remembering it. Through the
+API, N concurrent /trains/json misses for one route must reach upstream
+(the replay fetcher, slowed down) exactly once.
+
+With a short TTL, an expired route inside the grace window must be
+served at once as "stale" with Cache-Control: no-cache while a single
+background refresh per route runs, after which the route is "fresh"
+again; without a running refresher a stale hit must load synchronously.
+
+    python benchmarks/check_route_cache.py [--concurrency 20] [--delay 0.2] [--ttl 0.3]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["FETCH_MODE"] = "replay"
+os.environ["TIMETABLE_DB"] = ""
+
+import httpx
+
+import emergency_api as api
+from fetcher import ReplayFetcher
+from route_cache import FRESH, STALE, RouteCache, SingleFlight
+
+PARAMS = {"src_name": "Howrah Jn", "src_code": "HWH", "dst_name": "Barddhaman Jn", "dst_code": "BWN"}
+
+
+class CountingFetcher:
+    """Replays recorded pages after a delay, counting the fetches that reach it."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.fetches = 0
+        self._replay = ReplayFetcher()
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        with self._lock:
+            self.fetches += 1
+        time.sleep(self.delay)
+        return self._replay.get(url, timeout)
+
+    def close(self):
+        pass
+
+
+def expect(label, actual, expected):
+    if actual != expected:
+        sys.exit(f"{label}: got {actual!r}, expected {expected!r}")
+
+
+def check_route_cache():
+    now = [0.0]
+    cache = RouteCache(ttl=10, maxsize=2, stale_grace=5, clock=lambda: now[0])
+
+    expect("lookup of an empty cache", cache.lookup("a"), (None, None))
+    cache.set("a", "A")
+    expect("lookup within the TTL", cache.lookup("a"), ("A", FRESH))
+    expect("expires_in within the TTL", cache.expires_in("a"), 10.0)
+    now[0] = 12.0
+    expect("lookup within the stale grace", cache.lookup("a"), ("A", STALE))
+    expect("get of a stale entry", cache.get("a"), None)
+    expect("expires_in of a stale entry", cache.expires_in("a"), 0.0)
+    now[0] = 15.0
+    expect("lookup past the stale grace", cache.lookup("a"), (None, None))
+    expect("size after an expired lookup", len(cache), 0)
+
+    # Least recently used goes first: looking "b" up makes "c" the oldest
+    cache.set("b", "B")
+    cache.set("c", "C")
+    expect("lookup of b", cache.lookup("b"), ("B", FRESH))
+    cache.set("d", "D")
+    expect("evicted entry", cache.lookup("c"), (None, None))
+    expect("kept entries", (cache.get("b"), cache.get("d")), ("B", "D"))
+
+    stats = cache.stats()
+    expect("counters", {name: stats[name] for name in ("hits", "stale_hits", "misses", "evictions", "size")},
+           {"hits": 4, "stale_hits": 2, "misses": 3, "evictions": 1, "size": 2})
+    expect("hit ratio", stats["hit_ratio"], 6 / 9)
+    cache.clear()
+    expect("size after clear", len(cache), 0)
+    print("RouteCache ok: TTL, stale grace, LRU eviction at maxsize, counters")
+
+
+async def check_single_flight(concurrency):
+    flight = SingleFlight()
+    loads = []
+
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.05)
+        return object()
+
+    results = await asyncio.gather(*(flight.do("a", load) for _ in range(concurrency)))
+    expect("loads for concurrent callers", len(loads), 1)
+    expect("distinct results", len({id(result) for result in results}), 1)
+    expect("flight counters", flight.stats(), {"flights": 1, "coalesced": concurrency - 1, "in_flight": 0})
+
+    # A cancelled waiter leaves the shared load running for the others
+    first = asyncio.create_task(flight.do("b", load))
+    second = asyncio.create_task(flight.do("b", load))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    try:
+        result = await second
+    except asyncio.CancelledError:
+        result = None
+    if not first.cancelled() or result is None:
+        sys.exit("cancelling one waiter cancelled the shared load")
+    expect("loads after a cancelled waiter", len(loads), 2)
+
+    async def fail():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    failures = await asyncio.gather(*(flight.do("c", fail) for _ in range(3)), return_exceptions=True)
+    if not all(isinstance(failure, RuntimeError) for failure in failures):
+        sys.exit(f"waiters did not all get the load's exception: {failures}")
+    await flight.do("c", load)
+    expect("loads after a failed flight", len(loads), 4)
+    print(f"SingleFlight ok: {concurrency} callers, 1 load, {concurrency - 1} coalesced; "
+          "cancelled waiter keeps the load; failures reach every waiter")
+
+
+async def check_api_coalescing(client, upstream, concurrency):
+    api.route_cache.clear()
+    api.payload_cache.clear()
+    before = (upstream.fetches, api.route_flights.coalesced)
+    responses = await asyncio.gather(*(client.get("/trains/json", params=PARAMS) for _ in range(concurrency)))
+    if any(response.status_code != 200 or not response.json()["success"] for response in responses):
+        sys.exit("some concurrent /trains/json requests failed")
+    expect("upstream fetches for concurrent misses", upstream.fetches - before[0], 1)
+    expect("coalesced route loads", api.route_flights.coalesced - before[1], concurrency - 1)
+    print(f"/trains/json ok: {concurrency} concurrent misses, 1 upstream fetch, {concurrency - 1} coalesced")
+
+
+async def get_route(client):
+    response = await client.get("/trains/json", params=PARAMS)
+    if response.status_code != 200 or not response.json()["success"]:
+        sys.exit(f"/trains/json failed: {response.status_code}")
+    return response.json()["cache_status"], response.headers["cache-control"]
+
+
+async def expire_route(client, upstream, ttl):
+    # A freshly loaded route, then wait until it is past its TTL
+    api.route_cache.clear()
+    api.payload_cache.clear()
+    expect("first request", (await get_route(client))[0], FRESH)
+    fetches = upstream.fetches
+    await asyncio.sleep(ttl + 0.05)
+    return fetches
+
+
+async def check_stale_refresh(client, upstream, ttl, concurrency):
+    fetches = await expire_route(client, upstream, ttl)
+    refreshes = api.route_refresher.refreshes
+    responses = await asyncio.gather(*(get_route(client) for _ in range(concurrency)))
+    expect("expired route within the grace window", set(responses), {(STALE, "no-cache")})
+    expect("refreshes queued for the route", api.route_refresher.stats()["pending"], 1)
+
+    deadline = time.monotonic() + 5
+    while api.route_refresher.refreshes == refreshes:
+        if time.monotonic() > deadline:
+            sys.exit("the background refresh did not finish")
+        await asyncio.sleep(0.01)
+    status, cache_control = await get_route(client)
+    if status != FRESH or not cache_control.startswith("public, max-age="):
+        sys.exit(f"request after the refresh got {status!r} with Cache-Control {cache_control!r}")
+    expect("upstream fetches for the stale route", upstream.fetches - fetches, 1)
+    print(f"stale routes ok: {concurrency} stale responses with no-cache, 1 background refresh, then fresh")
+
+
+async def check_stale_without_refresher(client, upstream, ttl):
+    fetches = await expire_route(client, upstream, ttl)
+    if api.route_refresher.running:
+        sys.exit("the refresher is still running")
+    expect("stale hit without a refresher", (await get_route(client))[0], FRESH)
+    expect("synchronous loads", upstream.fetches - fetches, 1)
+    print("stale routes without a refresher ok: loaded synchronously and served fresh")
+
+
+async def run_api_checks(upstream, concurrency, ttl):
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+        async with api.app.router.lifespan_context(api.app):
+            await check_api_coalescing(client, upstream, concurrency)
+            api.route_cache.ttl = ttl
+            await check_stale_refresh(client, upstream, ttl, concurrency)
+        await check_stale_without_refresher(client, upstream, ttl)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--delay", type=float, default=0.2, help="seconds each upstream fetch takes")
+    parser.add_argument("--ttl", type=float, default=0.3, help="route cache TTL for the stale checks")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    check_route_cache()
+    asyncio.run(check_single_flight(args.concurrency))
+    upstream = CountingFetcher(args.delay)
+    api.get_fetcher = lambda: upstream
+    asyncio.run(run_api_checks(upstream, args.concurrency, args.ttl))
+
+
+if __name__ == "__main__":
+    main()
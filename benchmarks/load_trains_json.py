@@ -0,0 +1,82 @@
+"""Load test /trains/json against a slow local upstream.
+
+Every upstream response is delayed by --delay seconds, so a handler that
+blocks the event loop tops out at 1/delay requests per second no matter
+how many clients are waiting. With scrapes off the loop, throughput
+should grow with concurrency up to the worker / per-host limits.
+
+Each request asks for a different route (the stub serves the same saved
+page for all of them) and the route cache and timetable store are
+disabled, so every request really goes upstream.
+
+    python benchmarks/load_trains_json.py [--delay 0.2] [--requests 64]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from upstream_stub import start_stub_server
+
+PAGE = "HWH-to-BWN.html"
+
+
+async def run_level(app, concurrency, total):
+    import httpx
+
+    slots = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://api", timeout=120) as client:
+
+        async def one(i):
+            params = {"src_name": "Station", "src_code": f"S{concurrency}X{i}", "dst_name": "Barddhaman Jn", "dst_code": "BWN"}
+            async with slots:
+                response = await client.get("/trains/json", params=params)
+                response.raise_for_status()
+                if not response.json()["data"]:
+                    raise RuntimeError("upstream stub returned no trains")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--levels", default="1,2,4,8,16,32")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    base_url, stop = start_stub_server(delay=args.delay, default_page=PAGE)
+    os.environ["ETRAIN_BASE_URL"] = base_url
+    os.environ["ROUTE_CACHE_TTL"] = "0"
+    os.environ["ROUTE_CACHE_STALE_GRACE"] = "0"
+    os.environ["TIMETABLE_DB"] = ""
+    os.environ.setdefault("SCRAPE_WORKERS", str(max(levels)))
+    os.environ.setdefault("FETCH_POOL_SIZE", str(max(levels)))
+    os.environ.setdefault("FETCH_MAX_PER_HOST", str(max(levels)))
+
+    from emergency_api import app
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"upstream delay {args.delay * 1000:.0f} ms, {args.requests} requests per level, "
+          f"serial ceiling {1 / args.delay:.1f} req/s")
+    try:
+        for concurrency in levels:
+            elapsed = asyncio.run(run_level(app, concurrency, args.requests))
+            print(f"  concurrency {concurrency:>3}: {args.requests / elapsed:7.1f} req/s")
+    finally:
+        stop()
+
+
+if __name__ == "__main__":
+    main()
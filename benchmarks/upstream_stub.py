@@ -0,0 +1,105 @@
+"""Local stand-in for etrain.info that serves saved pages with a fixed delay.
+
+    /trains/Howrah-Jn-HWH-to-Barddhaman-Jn-BWN  ->  pages/HWH-to-BWN.html
+
+Unknown routes get the saved 404 page, or default_page when given. Run it
+directly, or use start_stub_server() from a benchmark and point
+ETRAIN_BASE_URL at it.
+
+    python benchmarks/upstream_stub.py [--port 8001] [--delay 0.2]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import threading
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import HTMLResponse
+from starlette.routing import Route
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGES_DIR = os.path.join(ROOT, "benchmarks", "pages")
+NOT_FOUND_PAGE = os.path.join(ROOT, "etrain_page.html")
+
+
+def route_codes(route):
+    src_slug, _, dst_slug = route.partition("-to-")
+    return src_slug.rsplit("-", 1)[-1].upper(), dst_slug.rsplit("-", 1)[-1].upper()
+
+
+def create_app(delay=0.0, pages_dir=PAGES_DIR, default_page=None):
+    with open(NOT_FOUND_PAGE, encoding="utf-8") as f:
+        not_found = f.read()
+    cache = {}
+
+    def load(name):
+        if name not in cache:
+            path = os.path.join(pages_dir, name)
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    cache[name] = f.read()
+            else:
+                cache[name] = None
+        return cache[name]
+
+    async def trains(request):
+        if delay:
+            await asyncio.sleep(delay)
+        src_code, dst_code = route_codes(request.path_params["route"])
+        page = load(f"{src_code}-to-{dst_code}.html")
+        if page is None:
+            recorded_404 = load(f"{src_code}-to-{dst_code}.404.html")
+            if recorded_404 is not None:
+                return HTMLResponse(recorded_404, status_code=404)
+        if page is None and default_page:
+            page = load(default_page)
+        if page is None:
+            return HTMLResponse(not_found, status_code=404)
+        return HTMLResponse(page)
+
+    return Starlette(routes=[Route("/trains/{route}", trains)])
+
+
+def start_stub_server(delay=0.0, pages_dir=PAGES_DIR, default_page=None):
+    """Serve the stub on a free localhost port in a daemon thread.
+
+    Returns (base_url, stop); call stop() to shut the server down.
+    """
+    return serve_app(create_app(delay, pages_dir, default_page))
+
+
+def serve_app(app):
+    """Serve any ASGI app on a free localhost port in a daemon thread; returns (base_url, stop)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+
+    config = uvicorn.Config(app, log_level="warning", backlog=2048)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("stub server failed to start")
+        threading.Event().wait(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.delay), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
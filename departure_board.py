@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SSE_HEARTBEAT = float(os.environ.get('SSE_HEARTBEAT', '15'))
+
+def seconds_to_next_minute(now=None):
+    # Departures are whole minutes, so the selection can only change just after hh:mm:00
+    now = now or datetime.now()
+    return 60 - now.second - now.microsecond / 1e6 + 0.05
+
+class DepartureBoard:
+    """The live "next trains" of one route, shared by all its subscribers.
+
+    While anyone is subscribed, a single task calls select() right away
+    and then at every minute boundary. select() returns (payload, state);
+    the payload is published only when state differs from the last one,
+    e.g. when a departure has passed or the timetable was refreshed.
+    Each subscriber gets a queue holding just the latest payload, so a
+    slow reader skips intermediate boards instead of piling them up.
+    """
+
+    def __init__(self, select, on_idle=None):
+        self._select = select
+        self._on_idle = on_idle
+        self._queues = set()
+        self._task = None
+        self.payload = None
+        self.version = 0
+        self.selections = 0
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=1)
+        if self.payload is not None:
+            queue.put_nowait((self.version, self.payload))
+        self._queues.add(queue)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._queues.discard(queue)
+        if not self._queues:
+            self.stop()
+            if self._on_idle is not None:
+                self._on_idle(self)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def subscribers(self):
+        return len(self._queues)
+
+    def _publish(self, payload):
+        self.payload = payload
+        self.version += 1
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((self.version, payload))
+
+    async def _run(self):
+        last_state = None
+        while True:
+            try:
+                payload, state = await self._select()
+                self.selections += 1
+            except Exception as e:
+                logger.error(f"Departure board selection failed: {e}", exc_info=True)
+            else:
+                if self.version == 0 or state != last_state:
+                    last_state = state
+                    self._publish(payload)
+            await asyncio.sleep(seconds_to_next_minute())
+
+class BoardRegistry:
+    """One DepartureBoard per key; a board is dropped with its last subscriber."""
+
+    def __init__(self):
+        self._boards = {}
+
+    def subscribe(self, key, select):
+        """Return (board, queue); select() is only used when the board is new."""
+        board = self._boards.get(key)
+        if board is None:
+            board = DepartureBoard(select, on_idle=lambda idle: self._drop(key, idle))
+            self._boards[key] = board
+        return board, board.subscribe()
+
+    def _drop(self, key, board):
+        if self._boards.get(key) is board:
+            del self._boards[key]
+
+    async def events(self, key, select, heartbeat=SSE_HEARTBEAT):
+        """Server-Sent Events for one subscriber of key's board: a
+        "departures" event per new board, and a comment line every
+        heartbeat seconds so proxies do not close an idle connection."""
+        board, queue = self.subscribe(key, select)
+        try:
+            while True:
+                try:
+                    version, payload = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {version}\nevent: departures\ndata: {payload}\n\n"
+        finally:
+            board.unsubscribe(queue)
+
+    def close(self):
+        for board in self._boards.values():
+            board.stop()
+        self._boards.clear()
+
+    def stats(self):
+        return {
+            'routes': len(self._boards),
+            'subscribers': sum(board.subscribers for board in self._boards.values()),
+            'selections': sum(board.selections for board in self._boards.values()),
+        }
@@ -1,9 +1,14 @@
-from fastapi import FastAPI, Query, HTTPException, status
+from fastapi import FastAPI, Header, Query, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import hashlib
+import os
 import uvicorn
 import logging
 from contextlib import asynccontextmanager
@@ -13,12 +18,109 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Import your scraping function
-from emergency_scraper import scrape_trains_between
+from emergency_scraper import RouteTimetable, fetch_trains, fetch_trains_async, select_trains
+from departure_board import BoardRegistry, seconds_to_next_minute
+from fast_json import dumps
+from fetcher import get_async_fetcher, get_fetcher
+import metrics
+from response_compression import CompressionMiddleware, EncodedBody
+from route_cache import FRESH, STALE, BackgroundRefresher, RouteCache, SingleFlight
+from tzlocal import get_localzone
+
+# "thread" runs the blocking scraper (requests + BeautifulSoup) on a bounded
+# thread pool, excess requests queue for a worker; "async" fetches with aiohttp
+# on the event loop itself and hands parsing to the same pool.
+SCRAPE_ENGINE = os.environ.get('SCRAPE_ENGINE', 'thread')
+SCRAPE_WORKERS = int(os.environ.get('SCRAPE_WORKERS', '8'))
+# Routes of one /trains/batch request that are scraped or looked up at once
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '8'))
+BATCH_MAX_ROUTES = int(os.environ.get('BATCH_MAX_ROUTES', '50'))
+
+_scrape_executor = None
+
+def get_scrape_executor():
+    global _scrape_executor
+    if _scrape_executor is None:
+        _scrape_executor = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS, thread_name_prefix="scrape")
+    return _scrape_executor
+
+async def run_fetch(src_name, src_code, dst_name, dst_code, date):
+    # Stored snapshots only stand in for upstream while younger than the
+    # route cache TTL: they warm a restarted process (or another worker),
+    # but an expired route or a stale refresh always goes upstream
+    max_age = route_cache.ttl
+    if SCRAPE_ENGINE == 'async':
+        return await fetch_trains_async(src_name, src_code, dst_name, dst_code, date, fetcher=get_async_fetcher(),
+                                        executor=get_scrape_executor(), store_max_age=max_age)
+    loop = asyncio.get_running_loop()
+    fetch = functools.partial(fetch_trains, src_name, src_code, dst_name, dst_code, date, fetcher=get_fetcher(),
+                              store_max_age=max_age)
+    return await loop.run_in_executor(get_scrape_executor(), fetch)
+
+# Caches the full parsed timetable and its departure columns per
+# (src_code, dst_code, date); the "next trains" selection depends on the
+# current time so it is redone on every request. Concurrent misses for
+# the same key share one fetch, and expired entries still within the
+# stale grace window are served at once while the refresher re-scrapes
+# them in the background.
+route_cache = RouteCache()
+# Rendered /trains/json bodies (and their compressed variants) per route,
+# cache status and selection ETag. A body is reused for up to a minute,
+# so its timestamp is when that selection was first rendered.
+payload_cache = RouteCache(ttl=60, stale_grace=0)
+route_flights = SingleFlight()
+route_refresher = BackgroundRefresher()
+# Live boards for /trains/stream: one selection loop per route, whatever
+# the number of viewers
+departure_boards = BoardRegistry()
+
+async def load_route(src_name, src_code, dst_name, dst_code, date, key):
+    trains = await run_fetch(src_name, src_code, dst_name, dst_code, date)
+    if trains is None:
+        return None
+    route = RouteTimetable(trains)
+    route_cache.set(key, route)
+    return route
+
+async def refresh_route(src_name, src_code, dst_name, dst_code, date, key):
+    return await route_flights.do(key, lambda: load_route(src_name, src_code, dst_name, dst_code, date, key))
+
+def route_key(src_code, dst_code, local_tz):
+    date = datetime.now(local_tz).strftime("%Y%m%d")
+    return src_code.strip().upper(), dst_code.strip().upper(), date
+
+async def run_scrape(src_name, src_code, dst_name, dst_code):
+    """Return (selected trains or None, FRESH or STALE)."""
+    local_tz = get_localzone()
+    key = route_key(src_code, dst_code, local_tz)
+    date = key[2]
+    args = (src_name, src_code, dst_name, dst_code, date, key)
+
+    route, cache_status = route_cache.lookup(key)
+    if cache_status == STALE and not route_refresher.schedule(key, refresh_route, *args):
+        route = None
+    if route is None:
+        route = await refresh_route(*args)
+        cache_status = FRESH
+        if route is None:
+            return None, cache_status
+
+    return select_trains(route.trains, local_tz, index=route.index), cache_status
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global _scrape_executor
     logger.info("Starting Train Info API...")
+    route_refresher.start()
     yield
+    departure_boards.close()
+    await route_refresher.stop()
+    if _scrape_executor is not None:
+        _scrape_executor.shutdown(wait=False, cancel_futures=True)
+        _scrape_executor = None
+    get_fetcher().close()
+    if SCRAPE_ENGINE == 'async':
+        await get_async_fetcher().close()
     logger.info("Shutting down Train Info API...")
 
 app = FastAPI(
@@ -28,6 +130,12 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Each add_middleware wraps the app built so far, so the last one added is
+# the outermost: requests pass CORS, then the in-flight gauge, then
+# compression, which sees the route's response first
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(metrics.InFlightMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -39,6 +147,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 class TrainInfo(BaseModel):
@@ -58,12 +167,98 @@ class TrainResponse(BaseModel):
     total_count: int
     timestamp: str
     message: Optional[str] = None
+    cache_status: Optional[str] = None
+
+class RouteQuery(BaseModel):
+    src_name: str = Field(..., example="Howrah Jn")
+    src_code: str = Field(..., example="HWH")
+    dst_name: str = Field(..., example="Chittaranjan")
+    dst_code: str = Field(..., example="CRJ")
+
+class BatchRequest(BaseModel):
+    routes: List[RouteQuery] = Field(..., min_length=1, max_length=BATCH_MAX_ROUTES)
+
+class RouteResult(TrainResponse):
+    index: Optional[int] = None  # position of the query in the batch
+    src_code: str
+    dst_code: str
+    status: str  # "ok", "not_found" or "error"
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    success: bool
+    results: List[RouteResult]
+    total_count: int
+    timestamp: str
 
 class ErrorResponse(BaseModel):
     success: bool = False
     error: str
     timestamp: str
 
+TRAIN_INFO_FIELDS = tuple(TrainInfo.model_fields)
+
+def train_payload(trains, cache_status):
+    """A TrainResponse as plain dicts, ready for fast_json.dumps without
+    building and validating pydantic models on the hot path."""
+    if trains is None:
+        return {
+            "success": True,
+            "data": [],
+            "total_count": 0,
+            "timestamp": datetime.now().isoformat(),
+            "message": "No trains found or invalid station code.",
+            "cache_status": cache_status
+        }
+
+    # t is a get_train_info dict, a selected copy of one or a TrainRecord
+    train_list = [
+        {name: t[name] for name in TRAIN_INFO_FIELDS if name in t} for t in trains
+    ]
+
+    return {
+        "success": True,
+        "data": train_list,
+        "total_count": len(train_list),
+        "timestamp": datetime.now().isoformat(),
+        "message": f"Found {len(train_list)} trains",
+        "cache_status": cache_status
+    }
+
+def selection_etag(trains):
+    """Weak ETag of the trains a response shows, computed from their fields
+    so that a matching If-None-Match needs no serialising at all."""
+    digest = hashlib.blake2b(digest_size=12)
+    if trains is None:
+        digest.update(b"none")
+    for t in trains or ():
+        for name in TRAIN_INFO_FIELDS:
+            value = t.get(name)
+            digest.update(("\x1f".join(value) if name == "booking_classes" else str(value)).encode())
+            digest.update(b"\x1e")
+        digest.update(b"\x1d")
+    return f'W/"{digest.hexdigest()}"'
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" match
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+def route_cache_control(src_code, dst_code, cache_status):
+    # Fresh for what is left of the route's cache TTL, but never past the
+    # next minute boundary, when a departure may drop off the selection
+    if cache_status != FRESH:
+        return "no-cache"
+    expires_in = route_cache.expires_in(route_key(src_code, dst_code, get_localzone()))
+    return f"public, max-age={int(min(expires_in, seconds_to_next_minute()))}"
+
+def build_train_response(trains, cache_status):
+    return TrainResponse.model_validate(train_payload(trains, cache_status))
+
 @app.get("/", response_model=dict)
 async def root():
     return {
@@ -76,6 +271,7 @@ async def root():
          response_model=TrainResponse,
          responses={
              200: {"description": "Successfully retrieved train data"},
+             304: {"description": "The selected trains still match the If-None-Match ETag"},
              400: {"model": ErrorResponse},
              500: {"model": ErrorResponse}
          })
@@ -83,7 +279,9 @@ async def get_trains_json(
     src_name: str = Query(..., example="Howrah Jn"),
     src_code: str = Query(..., example="HWH"),
     dst_name: str = Query(..., example="Chittaranjan"),
-    dst_code: str = Query(..., example="CRJ")
+    dst_code: str = Query(..., example="CRJ"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None)
 ):
     try:
         if not all([src_name.strip(), src_code.strip(), dst_name.strip(), dst_code.strip()]):
@@ -91,27 +289,25 @@ async def get_trains_json(
 
         logger.info(f"Fetching trains from {src_name} ({src_code}) to {dst_name} ({dst_code})")
 
-        trains = scrape_trains_between(src_name, src_code, dst_name, dst_code)
-        if trains is None:
-            return TrainResponse(
-                success=True,
-                data=[],
-                total_count=0,
-                timestamp=datetime.now().isoformat(),
-                message="No trains found or invalid station code."
-            )
-
-        train_list = [
-            TrainInfo(**t) for t in trains
-        ]
-
-        return TrainResponse(
-            success=True,
-            data=train_list,
-            total_count=len(train_list),
-            timestamp=datetime.now().isoformat(),
-            message=f"Found {len(train_list)} trains"
-        )
+        trains, cache_status = await run_scrape(src_name, src_code, dst_name, dst_code)
+        headers = {
+            "ETag": selection_etag(trains),
+            "Cache-Control": route_cache_control(src_code, dst_code, cache_status),
+            "Vary": "Accept-Encoding",
+        }
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        payload_key = (*route_key(src_code, dst_code, get_localzone()), cache_status, headers["ETag"])
+        encoded = payload_cache.get(payload_key)
+        if encoded is None:
+            with metrics.STAGE_SECONDS.time('serialise'):
+                encoded = EncodedBody(dumps(train_payload(trains, cache_status)))
+            payload_cache.set(payload_key, encoded)
+        body, encoding = encoded.encode(accept_encoding)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
 
     except ValueError as ve:
         logger.warning(f"Validation error: {ve}")
@@ -126,6 +322,147 @@ async def get_trains_json(
             detail=f"Internal server error: {e}"
         )
 
+def route_query_complete(query):
+    return all([query.src_name.strip(), query.src_code.strip(), query.dst_name.strip(), query.dst_code.strip()])
+
+async def scrape_route_result(query):
+    src_code, dst_code = query.src_code.strip().upper(), query.dst_code.strip().upper()
+    if not route_query_complete(query):
+        return RouteResult(success=False, data=[], total_count=0, timestamp=datetime.now().isoformat(),
+                           src_code=src_code, dst_code=dst_code, status="error",
+                           error="All parameters must be provided")
+    try:
+        trains, cache_status = await run_scrape(query.src_name, src_code, query.dst_name, dst_code)
+    except Exception as e:
+        logger.error(f"Error fetching trains from {src_code} to {dst_code}: {e}", exc_info=True)
+        return RouteResult(success=False, data=[], total_count=0, timestamp=datetime.now().isoformat(),
+                           src_code=src_code, dst_code=dst_code, status="error", error=str(e))
+    response = build_train_response(trains, cache_status)
+    return RouteResult(**dict(response), src_code=src_code, dst_code=dst_code,
+                       status="ok" if trains is not None else "not_found")
+
+def start_route_tasks(queries):
+    """Start one bounded scrape per distinct route; return [(query indexes, task)].
+
+    Valid queries for the same (src_code, dst_code) share one task, so a
+    route asked for twice in a batch is scraped or looked up once. Invalid
+    queries are checked first and get their own task, which answers with
+    the error at once, so they never decide the result of a valid one.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def bounded(query):
+        async with semaphore:
+            return await scrape_route_result(query)
+
+    tasks = []
+    routes = {}
+    for i, query in enumerate(queries):
+        if not route_query_complete(query):
+            tasks.append(([i], asyncio.create_task(scrape_route_result(query))))
+            continue
+        key = (query.src_code.strip().upper(), query.dst_code.strip().upper())
+        routes.setdefault(key, (query, []))[1].append(i)
+    return tasks + [(indexes, asyncio.create_task(bounded(query))) for query, indexes in routes.values()]
+
+async def stream_route_results(tasks):
+    """Yield one NDJSON line per query as soon as its route's task finishes."""
+    pending = {task: indexes for indexes, task in tasks}
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                for i in pending.pop(task):
+                    yield result.model_copy(update={'index': i}).model_dump_json() + "\n"
+    finally:
+        # The client went away: stop scraping routes nobody will read
+        for task in pending:
+            task.cancel()
+
+@app.post("/trains/batch",
+          response_model=BatchResponse,
+          responses={200: {"content": {"application/x-ndjson": {}},
+                           "description": "A BatchResponse, or with stream=true one RouteResult per line"}})
+async def get_trains_batch(batch: BatchRequest, stream: bool = Query(False)):
+    logger.info(f"Fetching trains for a batch of {len(batch.routes)} routes")
+    tasks = start_route_tasks(batch.routes)
+    if stream:
+        return StreamingResponse(stream_route_results(tasks), media_type="application/x-ndjson")
+
+    results = [None] * len(batch.routes)
+    for indexes, task in tasks:
+        result = await task
+        for i in indexes:
+            results[i] = result.model_copy(update={'index': i})
+    return BatchResponse(
+        success=True,
+        results=results,
+        total_count=len(results),
+        timestamp=datetime.now().isoformat()
+    )
+
+@app.get("/trains/stream",
+         response_class=StreamingResponse,
+         responses={200: {"content": {"text/event-stream": {}},
+                          "description": "A \"departures\" event with a TrainResponse whenever the next trains change"}})
+async def stream_trains(
+    src_name: str = Query(..., example="Howrah Jn"),
+    src_code: str = Query(..., example="HWH"),
+    dst_name: str = Query(..., example="Chittaranjan"),
+    dst_code: str = Query(..., example="CRJ")
+):
+    if not all([src_name.strip(), src_code.strip(), dst_name.strip(), dst_code.strip()]):
+        raise HTTPException(status_code=400, detail="All parameters must be provided")
+
+    async def select():
+        trains, cache_status = await run_scrape(src_name, src_code, dst_name, dst_code)
+        response = build_train_response(trains, cache_status)
+        # Only the trains shown decide whether subscribers get a new board
+        return response.model_dump_json(), response.model_dump_json(include={'data', 'message'})
+
+    key = (src_code.strip().upper(), dst_code.strip().upper())
+    logger.info(f"Streaming departures from {key[0]} to {key[1]}")
+    return StreamingResponse(departure_boards.events(key, select), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/stats/fetcher", response_model=dict)
+async def fetcher_stats():
+    if SCRAPE_ENGINE == 'async':
+        return get_async_fetcher().stats()
+    return get_fetcher().stats()
+
+@app.get("/stats/cache", response_model=dict)
+async def cache_stats():
+    return {
+        **route_cache.stats(),
+        'single_flight': route_flights.stats(),
+        'refresher': route_refresher.stats(),
+        'departure_boards': departure_boards.stats(),
+        'payloads': payload_cache.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    caches = {'route': route_cache.stats(), 'payload': payload_cache.stats()}
+    lookups = {}
+    for cache, stats in caches.items():
+        for result, count in (('hit', stats['hits']), ('stale_hit', stats['stale_hits']), ('miss', stats['misses'])):
+            lookups[cache, result] = count
+    flights = route_flights.stats()
+    extra = (
+        metrics.render_values('train_cache_lookups_total', 'Cache lookups by cache and result.', 'counter',
+                              lookups, ('cache', 'result'))
+        + metrics.render_values('train_cache_hit_ratio', 'Share of lookups served from the cache, stale included.',
+                                'gauge', {(cache,): stats['hit_ratio'] for cache, stats in caches.items()}, ('cache',))
+        + metrics.render_values('train_cache_entries', 'Entries held by each cache.', 'gauge',
+                                {(cache,): stats['size'] for cache, stats in caches.items()}, ('cache',))
+        + metrics.render_values('train_route_loads_total', 'Route loads started and callers that joined one in flight.',
+                                'counter', {('started',): flights['flights'], ('coalesced',): flights['coalesced']},
+                                ('kind',))
+    )
+    return PlainTextResponse(metrics.render(extra), media_type="text/plain; version=0.0.4")
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
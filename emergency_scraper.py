@@ -1,10 +1,59 @@
+import asyncio
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import json
+import logging
+import os
 import re
+from array import array
+from bisect import bisect_left
 from datetime import datetime, timedelta
-import pytz
+from itertools import islice
 from tzlocal import get_localzone
+from fetcher import ASYNC_FETCH_ERRORS, get_async_fetcher, get_fetcher
+from metrics import IN_FLIGHT, STAGE_SECONDS, UPSTREAM_ERRORS
+from timetable_store import get_store
+from train_record import TrainRecord, to_records
+
+try:
+    import numpy as np
+except ImportError:  # the vectorised departure index is optional
+    np = None
+
+logger = logging.getLogger(__name__)
+# Silent unless the application configures logging (the CLI and the API do)
+logger.addHandler(logging.NullHandler())
+
+ETRAIN_BASE_URL = os.environ.get('ETRAIN_BASE_URL', 'https://etrain.info').rstrip('/')
+PARSER_BACKEND = os.environ.get('TRAIN_PARSER_BACKEND', 'targeted')
+NUMPY_MIN_TRAINS = int(os.environ.get('NUMPY_MIN_TRAINS', '2000'))
+
+def _is_target_tag(name, attrs):
+    # Only train rows and the station-code warning are ever read from the page
+    if name == 'tr':
+        return 'data-train' in attrs
+    if name == 'div':
+        classes = attrs.get('class') or ''
+        if isinstance(classes, str):
+            classes = classes.split()
+        return 'warn' in classes
+    return False
+
+_TARGET_STRAINER = SoupStrainer(_is_target_tag)
+
+PARSER_BACKENDS = {
+    'html.parser': lambda html: BeautifulSoup(html, "html.parser"),
+    'lxml': lambda html: BeautifulSoup(html, "lxml"),
+    'targeted': lambda html: BeautifulSoup(html, "lxml", parse_only=_TARGET_STRAINER),
+}
+
+def parse_page(html, backend=None):
+    backend = backend or PARSER_BACKEND
+    try:
+        parser = PARSER_BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown parser backend: {backend!r} (expected one of {', '.join(PARSER_BACKENDS)})")
+    return parser(html)
 
 def slugify(name, code):
     return f"{name.strip().replace(' ', '-')}-{code.strip().upper()}"
@@ -12,11 +61,35 @@ def slugify(name, code):
 def build_url(src_name, src_code, dst_name, dst_code, date=None):
     src_slug = slugify(src_name, src_code)
     dst_slug = slugify(dst_name, dst_code)
-    url = f"https://etrain.info/trains/{src_slug}-to-{dst_slug}"
+    url = f"{ETRAIN_BASE_URL}/trains/{src_slug}-to-{dst_slug}"
     if date:
         url += f"?date={date}"
     return url
 
+NON_LOCAL_KEYWORDS = ['express', 'rajdhani', 'shatabdi', 'duronto', 'garib rath', 'superfast', 'super fast', 'fast', 'mail', 'special']
+LOCAL_KEYWORDS = ['local', 'suburban', 'passenger', 'memu', 'dmu', 'emu']
+
+_NON_LOCAL_RE = re.compile('|'.join(map(re.escape, NON_LOCAL_KEYWORDS)))
+_LOCAL_RE = re.compile('|'.join(map(re.escape, LOCAL_KEYWORDS)))
+
+NON_LOCAL = 'non_local'
+LOCAL = 'local'
+BOTH = 'both'  # matches keywords of both kinds, e.g. "EMU SPECIAL"
+UNKNOWN = 'unknown'
+
+def classify_train(train_name, train_type):
+    # The newline keeps a keyword from matching across the name/type boundary
+    text = f"{train_name}\n{train_type}".lower()
+    non_local = _NON_LOCAL_RE.search(text) is not None
+    local = _LOCAL_RE.search(text) is not None
+    if non_local:
+        return BOTH if local else NON_LOCAL
+    return LOCAL if local else UNKNOWN
+
+def train_category(train):
+    # Snapshots stored before trains carried a category are classified on the fly
+    return train.get('category') or classify_train(train['train_name'], train['train_type'])
+
 def get_booking_classes(row):
     classes = []
     booking_div = row.find('div', class_='flexRow')
@@ -43,10 +116,13 @@ def get_train_info(row):
         has_pantry = bool(row.find('i', class_='icon-food'))
         limited_run = bool(row.find('i', class_='icon-date'))
 
+        train_name = train_data.get('name', '')
+        train_type = train_data.get('typ', '')
+
         return {
             'train_number': train_data.get('num', ''),
-            'train_name': train_data.get('name', ''),
-            'train_type': train_data.get('typ', ''),
+            'train_name': train_name,
+            'train_type': train_type,
             'source': train_data.get('s', ''),
             'departure_time': train_data.get('st', ''),
             'destination': train_data.get('d', ''),
@@ -59,112 +135,528 @@ def get_train_info(row):
             'booking_classes': booking_classes,
             'notices': notices,
             'has_pantry': has_pantry,
-            'is_limited_run': limited_run
+            'is_limited_run': limited_run,
+            'category': classify_train(train_name, train_type)
         }
     except (json.JSONDecodeError, KeyError) as e:
-        print(f"Error processing row: {e}")
+        logger.warning("Skipping unreadable train row: %s", e)
         return None
 
+def iter_train_info(train_rows):
+    for row in train_rows:
+        train_info = get_train_info(row)
+        if train_info:
+            yield train_info
+
 def has_non_local_trains(trains):
-    keywords = ['express', 'rajdhani', 'shatabdi', 'duronto', 'garib rath', 'superfast', 'super fast', 'fast', 'mail', 'special']
-    return any(any(k in train['train_name'].lower() or k in train['train_type'].lower() for k in keywords) for train in trains)
+    return any(train_category(train) in (NON_LOCAL, BOTH) for train in trains)
 
 def has_local_trains(trains):
-    keywords = ['local', 'suburban', 'passenger', 'memu', 'dmu', 'emu']
-    return any(any(k in train['train_name'].lower() or k in train['train_type'].lower() for k in keywords) for train in trains)
-
-def get_trains_by_logic(trains, local_tz):
-    current_time = datetime.now(local_tz)
-    print(f"Current time: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    for train in trains:
-        try:
-            if train['departure_time']:
-                h, m = map(int, train['departure_time'].split(':'))
-                departure_naive = current_time.replace(hour=h, minute=m, second=0, microsecond=0)
-                departure_dt = local_tz.localize(departure_naive)
+    return any(train_category(train) in (LOCAL, BOTH) for train in trains)
 
-                if departure_dt < current_time:
-                    departure_dt += timedelta(days=1)
+MINUTES_PER_DAY = 24 * 60
 
-                train['departure_datetime'] = departure_dt
-                train['departure_datetime_str'] = departure_dt.strftime('%Y-%m-%d %H:%M')
+def departure_minute(departure_time):
+    # "HH:MM" -> minute of day, None when missing or malformed
+    try:
+        h, m = departure_time.split(':')
+        h, m = int(h), int(m)
+    except (AttributeError, ValueError):
+        return None
+    if 0 <= h < 24 and 0 <= m < 60:
+        return h * 60 + m
+    return None
+
+def _first_upcoming_minute(current_time):
+    # A departure at the current minute has already gone unless now is exactly hh:mm:00
+    now_minute = current_time.hour * 60 + current_time.minute
+    if current_time.second or current_time.microsecond:
+        now_minute += 1
+    return now_minute
+
+class DepartureIndex:
+    """Departure minutes of a timetable, sorted once so that "next N after
+    now" and "within the next hour" are a binary search and a wraparound
+    slice instead of per-request datetime arithmetic.
+
+    minutes and positions are parallel arrays ordered by (minute, position);
+    positions index into the train list the index was built from. Trains
+    without a usable departure time are kept, in list order, in unknown.
+    """
+
+    __slots__ = ('minutes', 'positions', 'unknown')
+
+    def __init__(self, trains):
+        known = []
+        unknown = []
+        for position, train in enumerate(trains):
+            minute = departure_minute(train.get('departure_time'))
+            if minute is None:
+                unknown.append(position)
             else:
-                raise ValueError("No departure time")
-        except Exception as e:
-            print(f"Error parsing departure time for train {train.get('train_number')}: {e}")
-            train['departure_datetime'] = current_time + timedelta(days=365)
-            train['departure_datetime_str'] = 'Unknown'
-
-    sorted_trains = sorted(trains, key=lambda x: x['departure_datetime'])
-
-    if has_non_local_trains(sorted_trains) and has_local_trains(sorted_trains):
-        print("🚄 Both local and non-local trains detected! Showing first 3 trains.")
-        return sorted_trains[:3], "mixed"
-    elif has_non_local_trains(sorted_trains):
-        non_locals = [t for t in sorted_trains if any(k in t['train_name'].lower() or k in t['train_type'].lower()
-                                                      for k in ['express', 'rajdhani', 'shatabdi', 'duronto', 'garib rath', 'superfast', 'super fast', 'fast', 'mail', 'special'])]
-        print("🚄 Only non-local trains detected! Showing next 3 non-local trains.")
-        return non_locals[:3], "non_local"
-    elif has_local_trains(sorted_trains):
-        end_time = current_time + timedelta(hours=1)
-        locals_in_1hr = [t for t in sorted_trains if t['departure_datetime'] <= end_time]
+                known.append((minute, position))
+        known.sort()
+        self.minutes = array('H', [minute for minute, _ in known])
+        self.positions = array('I', [position for _, position in known])
+        self.unknown = array('I', unknown)
+
+    def __len__(self):
+        return len(self.minutes) + len(self.unknown)
+
+    def upcoming(self, current_time):
+        """Yield (position, minutes after today's midnight) in departure order.
+
+        Departures earlier than current_time are tomorrow's (offset + 1440);
+        unknown departures come last with an offset of None.
+        """
+        minutes, positions = self.minutes, self.positions
+        start = bisect_left(minutes, _first_upcoming_minute(current_time))
+        for i in range(start, len(minutes)):
+            yield positions[i], minutes[i]
+        for i in range(start):
+            yield positions[i], minutes[i] + MINUTES_PER_DAY
+        for position in self.unknown:
+            yield position, None
+
+    def first(self, current_time, k, accept=None):
+        """The k earliest (position, offset) pairs, optionally only positions accept() allows."""
+        upcoming = self.upcoming(current_time)
+        if accept is not None:
+            upcoming = (d for d in upcoming if accept(d[0]))
+        return list(islice(upcoming, k))
+
+    def within(self, current_time, minutes=60):
+        """(position, offset) pairs departing at most `minutes` after current_time, in order."""
+        last = current_time.hour * 60 + current_time.minute + minutes
+        selected = []
+        for position, offset in self.upcoming(current_time):
+            if offset is None or offset > last:
+                break
+            selected.append((position, offset))
+        return selected
+
+_UNKNOWN_OFFSET = 2 * MINUTES_PER_DAY
+
+def departure_minutes_array(departure_times):
+    """Vectorised departure_minute: an int16 array of minutes of day, -1 where unknown."""
+    times = np.array(departure_times, dtype='U6')
+    n = len(times)
+    codes = times.view(np.uint32).reshape(n, 6).astype(np.int32)
+    lengths = np.char.str_len(times)
+    digits = codes[:, [0, 1, 3, 4]] - ord('0')
+    strict = (lengths == 5) & (codes[:, 2] == ord(':')) & ((digits >= 0) & (digits <= 9)).all(axis=1)
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    mins = digits[:, 2] * 10 + digits[:, 3]
+    minutes = np.where(strict & (hours < 24) & (mins < 60), hours * 60 + mins, -1).astype(np.int16)
+    # Anything not in strict "HH:MM" form ("5:07", "05:07:00", ...) goes through the scalar parser
+    for i in np.flatnonzero(~strict & (lengths > 0)):
+        minute = departure_minute(departure_times[i])
+        minutes[i] = -1 if minute is None else minute
+    return minutes
+
+class VectorDepartureIndex:
+    """NumPy counterpart of DepartureIndex for large timetables.
+
+    Keeps one int16 minute-of-day per train and computes next-occurrence
+    offsets against "now" with vector ops on every query, selecting with
+    argpartition. Ties break by list position, exactly like DepartureIndex.
+    """
+
+    __slots__ = ('minutes',)
+
+    def __init__(self, trains):
+        self.minutes = departure_minutes_array([train.get('departure_time') for train in trains])
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def _offsets_and_keys(self, current_time):
+        minutes = self.minutes.astype(np.int64)
+        offsets = np.where(minutes >= _first_upcoming_minute(current_time), minutes, minutes + MINUTES_PER_DAY)
+        offsets[minutes < 0] = _UNKNOWN_OFFSET
+        # Unique sort keys: departure order, then list position
+        keys = offsets * len(minutes) + np.arange(len(minutes))
+        return offsets, keys
+
+    @staticmethod
+    def _pairs(positions, offsets):
+        return [(int(p), None if offsets[p] == _UNKNOWN_OFFSET else int(offsets[p])) for p in positions]
+
+    def first(self, current_time, k, accept=None):
+        offsets, keys = self._offsets_and_keys(current_time)
+        candidates = None
+        if accept is not None:
+            candidates = np.flatnonzero(np.fromiter(map(accept, range(len(keys))), dtype=bool, count=len(keys)))
+            keys = keys[candidates]
+        k = min(k, len(keys))
+        if k == 0:
+            return []
+        chosen = np.argpartition(keys, k - 1)[:k]
+        chosen = chosen[np.argsort(keys[chosen])]
+        if candidates is not None:
+            chosen = candidates[chosen]
+        return self._pairs(chosen, offsets)
+
+    def within(self, current_time, minutes=60):
+        offsets, keys = self._offsets_and_keys(current_time)
+        chosen = np.flatnonzero(offsets <= current_time.hour * 60 + current_time.minute + minutes)
+        chosen = chosen[np.argsort(keys[chosen])]
+        return self._pairs(chosen, offsets)
+
+# Category codes of the columnar store are bit flags: BOTH has both bits set
+CATEGORY_CODES = {UNKNOWN: 0, NON_LOCAL: 1, LOCAL: 2, BOTH: 3}
+NON_LOCAL_BIT = 1
+LOCAL_BIT = 2
+
+# One bit per booking class in TimetableColumns.classes; classes not listed
+# here are still shown, they just cannot be filtered on
+BOOKING_CLASSES = ('1A', '2A', '3A', '3E', 'SL', 'CC', 'EC', '2S', 'FC', 'EA', 'EV', 'VS', 'GN')
+BOOKING_CLASS_BITS = {name: 1 << bit for bit, name in enumerate(BOOKING_CLASSES)}
+
+def duration_minutes(duration):
+    # "HH:MM" or "HH:MMH" -> minutes, -1 when missing or malformed
+    try:
+        h, m = duration.rstrip('Hh').split(':')
+        h, m = int(h), int(m)
+    except (AttributeError, ValueError):
+        return -1
+    return h * 60 + m if h >= 0 and 0 <= m < 60 else -1
+
+def booking_class_mask(booking_classes):
+    mask = 0
+    for name in booking_classes:
+        mask |= BOOKING_CLASS_BITS.get(name, 0)
+    return mask
+
+class TimetableColumns:
+    """A route's trains as parallel typed arrays, in departure order.
+
+    Rows are sorted by (departure minute, list position) like DepartureIndex,
+    trains without a usable departure time last; positions maps each row
+    back to the train list. The other columns hold what filtering and
+    selection read (train number, arrival and duration minutes, the
+    category as CATEGORY_CODES bit flags, booking classes as a
+    BOOKING_CLASS_BITS mask), so queries never touch the per-train records.
+    Unknown minutes are -1; train numbers that are not numeric are 0.
+    category_bits and class_bits OR together every row's flags, so a query
+    for a category or class no train has is answered without a scan.
+    """
+
+    __slots__ = ('positions', 'numbers', 'departure', 'arrival', 'duration', 'category', 'classes', 'known',
+                 'category_bits', 'class_bits')
+
+    def __init__(self, trains):
+        rows = []
+        for position, train in enumerate(trains):
+            minute = departure_minute(train.get('departure_time'))
+            rows.append((minute is None, minute or 0, position))
+        rows.sort()
+
+        self.positions = array('I')
+        self.numbers = array('I')
+        self.departure = array('h')
+        self.arrival = array('h')
+        self.duration = array('i')
+        self.category = array('B')
+        self.classes = array('H')
+        self.known = 0
+        self.category_bits = 0
+        self.class_bits = 0
+        for unknown, minute, position in rows:
+            train = trains[position]
+            number = str(train.get('train_number', ''))
+            arrival = departure_minute(train.get('arrival_time'))
+            self.positions.append(position)
+            self.numbers.append(int(number) if number.isdigit() and len(number) < 10 else 0)
+            self.departure.append(-1 if unknown else minute)
+            self.arrival.append(-1 if arrival is None else arrival)
+            self.duration.append(duration_minutes(train.get('duration')))
+            self.category.append(CATEGORY_CODES[train_category(train)])
+            self.classes.append(booking_class_mask(train.get('booking_classes', ())))
+            self.known += not unknown
+            self.category_bits |= self.category[-1]
+            self.class_bits |= self.classes[-1]
+
+    def __len__(self):
+        return len(self.positions)
+
+    def has_category(self, bit):
+        return bool(self.category_bits & bit)
+
+    def _upcoming_rows(self, current_time):
+        # (row, offset) in departure order, see DepartureIndex.upcoming
+        known = self.known
+        start = bisect_left(self.departure, _first_upcoming_minute(current_time), 0, known)
+        for row in range(start, known):
+            yield row, self.departure[row]
+        for row in range(start):
+            yield row, self.departure[row] + MINUTES_PER_DAY
+        for row in range(known, len(self.positions)):
+            yield row, None
+
+    def first(self, current_time, k, accept=None, categories=0, booking_class=None):
+        """The k earliest (position, offset) pairs.
+
+        categories keeps rows whose category shares a bit with it,
+        booking_class rows bookable in that class; accept(position) is a
+        last-resort filter that does look at the train list.
+        """
+        mask = BOOKING_CLASS_BITS.get(booking_class, 0) if booking_class else 0
+        if (booking_class and not mask & self.class_bits) or (categories and not categories & self.category_bits):
+            return []
+        category, classes, positions = self.category, self.classes, self.positions
+        selected = []
+        if k <= 0:
+            return selected
+        for row, offset in self._upcoming_rows(current_time):
+            if categories and not category[row] & categories:
+                continue
+            if mask and not classes[row] & mask:
+                continue
+            if accept is not None and not accept(positions[row]):
+                continue
+            selected.append((positions[row], offset))
+            if len(selected) == k:
+                break
+        return selected
+
+    def within(self, current_time, minutes=60):
+        """(position, offset) pairs departing at most `minutes` after current_time, in order."""
+        last = current_time.hour * 60 + current_time.minute + minutes
+        selected = []
+        for row, offset in self._upcoming_rows(current_time):
+            if offset is None or offset > last:
+                break
+            selected.append((self.positions[row], offset))
+        return selected
+
+def build_departure_index(trains):
+    # For one-off selections over big batches the vectorised build wins; a
+    # cached route is queried many times, where the sorted DepartureIndex wins.
+    # Only direct library calls reach the vector index: get_trains_by_logic or
+    # select_trains without an index on a list of NUMPY_MIN_TRAINS or more,
+    # e.g. trains gathered across a division's routes. The API passes each
+    # route's cached TimetableColumns, and one route is far below the threshold.
+    if np is not None and len(trains) >= NUMPY_MIN_TRAINS:
+        return VectorDepartureIndex(trains)
+    return DepartureIndex(trains)
+
+def _with_departure(train, offset, current_time, midnight):
+    train = train.as_dict() if isinstance(train, TrainRecord) else dict(train)
+    if offset is None:
+        train['departure_datetime'] = current_time + timedelta(days=365)
+        train['departure_datetime_str'] = 'Unknown'
+    else:
+        departure_dt = midnight + timedelta(minutes=offset)
+        train['departure_datetime'] = departure_dt
+        train['departure_datetime_str'] = departure_dt.strftime('%Y-%m-%d %H:%M')
+    return train
+
+def get_trains_by_logic(trains, local_tz, now=None, index=None):
+    """Pick the trains to show; returns (annotated copies, selection label).
+
+    Pass the route's prebuilt departure index to skip rebuilding it.
+    """
+    current_time = now or datetime.now(local_tz)
+    logger.debug("Selecting trains at %s", current_time)
+
+    selected, train_type = select_departures(trains, current_time, index=index)
+    midnight = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [_with_departure(trains[position], offset, current_time, midnight) for position, offset in selected], train_type
+
+def select_departures(trains, current_time, k=3, index=None):
+    """Return ([(position, offset), ...], selection label); see DepartureIndex.upcoming."""
+    if index is None:
+        index = build_departure_index(trains)
+
+    if isinstance(index, TimetableColumns):
+        any_non_local = index.has_category(NON_LOCAL_BIT)
+        any_local = index.has_category(LOCAL_BIT)
+        next_non_local = lambda: index.first(current_time, k, categories=NON_LOCAL_BIT)
+    else:
+        any_non_local = False
+        any_local = False
+        for train in trains:
+            category = train_category(train)
+            if category in (NON_LOCAL, BOTH):
+                any_non_local = True
+            if category in (LOCAL, BOTH):
+                any_local = True
+            if any_local and any_non_local:
+                break  # mixed: the first k overall are shown, no need to look further
+        next_non_local = lambda: index.first(current_time, k, lambda p: train_category(trains[p]) in (NON_LOCAL, BOTH))
+
+    if any_non_local and any_local:
+        logger.debug("Both local and non-local trains: showing the first %d", k)
+        return index.first(current_time, k), "mixed"
+    elif any_non_local:
+        logger.debug("Only non-local trains: showing the next %d non-local trains", k)
+        return next_non_local(), "non_local"
+    elif any_local:
+        locals_in_1hr = index.within(current_time, 60)
         if locals_in_1hr:
-            print("🔍 Only local trains detected! Showing those within 1 hour.")
+            logger.debug("Only local trains: showing those within 1 hour")
             return locals_in_1hr, "local"
         else:
-            print("⚠️ No local trains within 1 hour. Showing next 3 trains.")
-            return sorted_trains[:3], "local_fallback"
+            logger.debug("No local trains within 1 hour: showing the next %d", k)
+            return index.first(current_time, k), "local_fallback"
     else:
-        print("🚂 No specific types found. Showing next 3 trains.")
-        return sorted_trains[:3], "other"
+        logger.debug("No specific train types: showing the next %d", k)
+        return index.first(current_time, k), "other"
 
-def scrape_trains_between(src_name, src_code, dst_name, dst_code, output_json=None):
-    local_tz = get_localzone()
-    current_date = datetime.now(local_tz).strftime("%Y%m%d")
+class RouteTimetable:
+    """A route's parsed trains, as compact TrainRecords, together with their
+    TimetableColumns, as cached by the API; selection runs over the columns."""
 
-    url = build_url(src_name, src_code, dst_name, dst_code, current_date)
-    print(f"\nFetching trains from {src_name} ({src_code}) to {dst_name} ({dst_code})")
-    print(f"Date: {current_date}")
-    print(f"URL: {url}\n")
+    __slots__ = ('trains', 'index')
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0',
-        'Accept': 'text/html',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Connection': 'keep-alive',
-    }
+    def __init__(self, trains):
+        self.trains = to_records(trains)
+        self.index = TimetableColumns(self.trains)
 
-    try:
-        response = requests.get(url, headers=headers, timeout=30)
-        response.raise_for_status()
-    except requests.RequestException as e:
-        print(f"❌ Failed to fetch page: {e}")
-        return None
-
-    soup = BeautifulSoup(response.text, "html.parser")
+def parse_trains(html):
+    with STAGE_SECONDS.time('parse'):
+        soup = parse_page(html)
 
     if soup.find('div', class_='warn'):
         warn_text = soup.find('div', class_='warn').get_text(strip=True)
-        print(f"❗ Error: {warn_text}")
-        print("Please check the station codes you entered. They might be incorrect.")
+        logger.warning("etrain.info rejected the route (check the station codes): %s", warn_text)
         return None
 
     train_rows = soup.find_all('tr', attrs={'data-train': True})
 
     if not train_rows:
-        print("⚠️ No train data found between the provided stations.")
+        logger.warning("No train data found between the provided stations")
         return None
 
-    trains = [get_train_info(row) for row in train_rows if get_train_info(row)]
-    print(f"\nTotal trains found: {len(trains)}")
+    with STAGE_SECONDS.time('extract'):
+        trains = list(iter_train_info(train_rows))
+    logger.debug("Parsed %d trains", len(trains))
+    return trains
 
-    selected_trains, train_type = get_trains_by_logic(trains, local_tz)
+def select_trains_with_label(trains, local_tz, index=None):
+    """Select the trains to show with their departure datetimes as strings;
+    returns (selected trains, selection label)."""
+    with STAGE_SECONDS.time('select'):
+        selected_trains, train_type = get_trains_by_logic(trains, local_tz, index=index)
 
     for train in selected_trains:
         if isinstance(train.get('departure_datetime'), datetime):
             train['departure_datetime'] = train['departure_datetime'].strftime('%Y-%m-%d %H:%M:%S')
 
+    logger.debug("Selected %d trains (%s)", len(selected_trains), train_type)
+    return selected_trains, train_type
+
+def save_trains_json(selected_trains, output_json):
+    with open(output_json, "w", encoding="utf-8") as f:
+        json.dump(selected_trains, f, indent=2, ensure_ascii=False)
+    logger.info("Saved train data to %s", output_json)
+
+def select_trains(trains, local_tz, output_json=None, index=None):
+    selected_trains, _ = select_trains_with_label(trains, local_tz, index=index)
+    if output_json and selected_trains:
+        save_trains_json(selected_trains, output_json)
+    return selected_trains
+
+def _route_url(src_name, src_code, dst_name, dst_code, date):
+    url = build_url(src_name, src_code, dst_name, dst_code, date)
+    logger.debug("Fetching trains from %s (%s) to %s (%s) on %s: %s", src_name, src_code, dst_name, dst_code, date, url)
+    return url
+
+def _stored_trains(store, src_code, dst_code, date, max_age=None):
+    trains = store.get(src_code, dst_code, date, max_age) if store is not None else None
+    if trains is not None:
+        logger.debug("Using stored timetable: %d trains", len(trains))
+    return trains
+
+def _store_trains(store, src_code, dst_code, date, trains):
+    if store is not None and trains:
+        store.put(src_code, dst_code, date, trains)
+    return trains
+
+def upstream_error_type(error):
+    # HTTP errors by status (requests and aiohttp), anything else by exception class
+    status = getattr(getattr(error, 'response', None), 'status_code', None) or getattr(error, 'status', None)
+    return f"http_{status}" if isinstance(status, int) else type(error).__name__
+
+def fetch_trains(src_name, src_code, dst_name, dst_code, date, fetcher=None, store=None, store_max_age=None):
+    """Parsed trains of a route, or None. A stored snapshot younger than
+    store_max_age seconds (the store's own limit when None) is used instead
+    of fetching; a fetched timetable is always written back."""
+    store = store if store is not None else get_store()
+    trains = _stored_trains(store, src_code, dst_code, date, store_max_age)
+    if trains is not None:
+        return trains
+
+    url = _route_url(src_name, src_code, dst_name, dst_code, date)
+
+    fetcher = fetcher or get_fetcher()
+    try:
+        with IN_FLIGHT.track('upstream_fetches'), STAGE_SECONDS.time('fetch'):
+            html = fetcher.get(url)
+    except requests.RequestException as e:
+        UPSTREAM_ERRORS.inc(upstream_error_type(e))
+        logger.warning("Failed to fetch %s: %s", url, e)
+        return None
+
+    return _store_trains(store, src_code, dst_code, date, parse_trains(html))
+
+def _parse_and_store(store, src_code, dst_code, date, html):
+    return _store_trains(store, src_code, dst_code, date, parse_trains(html))
+
+async def fetch_trains_async(src_name, src_code, dst_name, dst_code, date, fetcher=None, store=None, executor=None,
+                             store_max_age=None):
+    # Only the fetch runs on the event loop: parsing and the SQLite store
+    # block, so they run on executor (the loop's default one when None)
+    loop = asyncio.get_running_loop()
+    store = store if store is not None else get_store()
+    if store is not None:
+        trains = await loop.run_in_executor(executor, _stored_trains, store, src_code, dst_code, date, store_max_age)
+        if trains is not None:
+            return trains
+
+    url = _route_url(src_name, src_code, dst_name, dst_code, date)
+
+    fetcher = fetcher or get_async_fetcher()
+    try:
+        with IN_FLIGHT.track('upstream_fetches'), STAGE_SECONDS.time('fetch'):
+            html = await fetcher.get(url)
+    except ASYNC_FETCH_ERRORS as e:
+        UPSTREAM_ERRORS.inc(upstream_error_type(e))
+        logger.warning("Failed to fetch %s: %s", url, e)
+        return None
+
+    return await loop.run_in_executor(executor, _parse_and_store, store, src_code, dst_code, date, html)
+
+def scrape_trains_between(src_name, src_code, dst_name, dst_code, output_json=None, fetcher=None, store=None):
+    local_tz = get_localzone()
+    current_date = datetime.now(local_tz).strftime("%Y%m%d")
+
+    trains = fetch_trains(src_name, src_code, dst_name, dst_code, current_date, fetcher, store)
+    if trains is None:
+        return None
+    return select_trains(trains, local_tz, output_json)
+
+async def scrape_trains_between_async(src_name, src_code, dst_name, dst_code, output_json=None, fetcher=None, store=None,
+                                      executor=None):
+    local_tz = get_localzone()
+    current_date = datetime.now(local_tz).strftime("%Y%m%d")
+
+    trains = await fetch_trains_async(src_name, src_code, dst_name, dst_code, current_date, fetcher, store, executor)
+    if trains is None:
+        return None
+    return select_trains(trains, local_tz, output_json)
+
+def get_station_input():
+    print("Indian Railways Train Search Tool")
+    print("="*50)
+    src_name = input("Enter source station name (e.g., Howrah Jn): ").strip()
+    src_code = input("Enter source station code (e.g., HWH): ").strip().upper()
+    dst_name = input("Enter destination station name (e.g., Chittaranjan): ").strip()
+    dst_code = input("Enter destination station code (e.g., CRJ): ").strip().upper()
+    return src_name, src_code, dst_name, dst_code
+
+def print_train_table(selected_trains, train_type):
     print(f"\nSelected trains: {len(selected_trains)}")
 
     print(f"\n{'='*80}")
@@ -190,29 +682,28 @@ def scrape_trains_between(src_name, src_code, dst_name, dst_code, output_json=No
         print(f"   Booking Classes: {', '.join(train['booking_classes']) if train['booking_classes'] else 'None'}")
         print("-" * 60)
 
-    if output_json and selected_trains:
-        with open(output_json, "w", encoding="utf-8") as f:
-            json.dump(selected_trains, f, indent=2, ensure_ascii=False)
-        print(f"\n📄 Saved train data to {output_json}")
-
-    return selected_trains
-
-def get_station_input():
-    print("Indian Railways Train Search Tool")
-    print("="*50)
-    src_name = input("Enter source station name (e.g., Howrah Jn): ").strip()
-    src_code = input("Enter source station code (e.g., HWH): ").strip().upper()
-    dst_name = input("Enter destination station name (e.g., Chittaranjan): ").strip()
-    dst_code = input("Enter destination station code (e.g., CRJ): ").strip().upper()
-    return src_name, src_code, dst_name, dst_code
-
 def main():
+    # Problems (bad station codes, failed fetches) are logged as warnings;
+    # LOG_LEVEL=DEBUG also shows what the scraper is doing
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), format="%(message)s")
     try:
         src_name, src_code, dst_name, dst_code = get_station_input()
         output_json = "next_3_trains.json"
-        trains = scrape_trains_between(src_name, src_code, dst_name, dst_code, output_json)
+        local_tz = get_localzone()
+        current_date = datetime.now(local_tz).strftime("%Y%m%d")
+        print(f"\nFetching trains from {src_name} ({src_code}) to {dst_name} ({dst_code})")
+        print(f"Date: {current_date}")
+
+        trains = fetch_trains(src_name, src_code, dst_name, dst_code, current_date, fetcher=get_fetcher())
+        selected_trains = None
         if trains:
-            print(f"\n✅ Successfully found {len(trains)} trains.")
+            print(f"\nTotal trains found: {len(trains)}")
+            selected_trains, train_type = select_trains_with_label(trains, local_tz)
+            print_train_table(selected_trains, train_type)
+            if selected_trains:
+                save_trains_json(selected_trains, output_json)
+        if selected_trains:
+            print(f"\n✅ Successfully found {len(selected_trains)} trains.")
         else:
             print(f"\n❌ No trains found.")
     except KeyboardInterrupt:
@@ -0,0 +1,15 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library encoder is the fallback
+    orjson = None
+
+JSON_BACKEND = 'orjson' if orjson is not None else 'json'
+
+def dumps(content):
+    """Serialise to compact UTF-8 JSON bytes, the same bytes either way for
+    str/int/bool/None/list/tuple/dict content."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,319 @@
+import asyncio
+import os
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import aiohttp
+except ImportError:  # the async engine is optional
+    aiohttp = None
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0',
+    'Accept': 'text/html',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Connection': 'keep-alive',
+}
+
+POOL_SIZE = int(os.environ.get('FETCH_POOL_SIZE', '10'))
+MAX_PER_HOST = int(os.environ.get('FETCH_MAX_PER_HOST', '4'))
+FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT', '30'))
+# live: fetch from etrain.info; replay: serve pages recorded in REPLAY_DIR;
+# record: fetch live and save every page to REPLAY_DIR
+FETCH_MODE = os.environ.get('FETCH_MODE', 'live')
+REPLAY_DIR = os.environ.get('REPLAY_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'pages'))
+
+class PooledFetcher:
+    """Thread-safe keep-alive HTTP fetcher shared by the CLI and the API.
+
+    pool_size is the number of idle connections kept open per host;
+    max_per_host caps how many requests may be in flight to one host at
+    once, callers beyond that wait for a free slot.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, max_per_host=MAX_PER_HOST, timeout=FETCH_TIMEOUT, headers=None):
+        self.pool_size = pool_size
+        self.max_per_host = min(max_per_host, pool_size)
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        self._adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('http://', self._adapter)
+        self.session.mount('https://', self._adapter)
+
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._requests = 0
+        self._waits = 0
+
+    def _slot(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return slot
+
+    def get(self, url, timeout=None):
+        """Fetch url and return the response body; raises requests.RequestException."""
+        slot = self._slot(url)
+        if not slot.acquire(blocking=False):
+            with self._lock:
+                self._waits += 1
+            slot.acquire()
+        try:
+            with self._lock:
+                self._requests += 1
+            response = self.session.get(url, timeout=timeout or self.timeout)
+            response.raise_for_status()
+            return response.text
+        finally:
+            slot.release()
+
+    def stats(self):
+        pools = self._adapter.poolmanager.pools
+        new_connections = 0
+        with pools.lock:
+            for key in pools.keys():
+                new_connections += pools[key].num_connections
+        with self._lock:
+            requests_made, waits = self._requests, self._waits
+        return {
+            'requests': requests_made,
+            'hits': max(requests_made - new_connections, 0),
+            'new_connections': new_connections,
+            'waits': waits,
+            'pool_size': self.pool_size,
+            'max_per_host': self.max_per_host,
+        }
+
+    def close(self):
+        self.session.close()
+
+def replay_key(url):
+    """(route, date) of a trains URL: .../trains/Howrah-Jn-HWH-to-Barddhaman-Jn-BWN?date=20250629
+    -> ('HWH-to-BWN', '20250629'); date is '' when the URL has none."""
+    parts = urlsplit(url)
+    src_slug, _, dst_slug = parts.path.rstrip('/').rsplit('/', 1)[-1].partition('-to-')
+    route = f"{src_slug.rsplit('-', 1)[-1].upper()}-to-{dst_slug.rsplit('-', 1)[-1].upper()}"
+    return route, parse_qs(parts.query).get('date', [''])[0]
+
+def replay_filename(route, date='', status=200):
+    # HWH-to-BWN.html, HWH-to-BWN.20250629.html, HWH-to-ZZZ.404.html
+    parts = [route] + ([date] if date else []) + ([str(status)] if status != 200 else [])
+    return '.'.join(parts) + '.html'
+
+def _parse_replay_filename(name):
+    route, *rest = name[:-len('.html')].split('.')
+    date, status = '', 200
+    for part in rest:
+        if len(part) == 3 and part.isdigit():
+            status = int(part)
+        else:
+            date = part
+    return route, date, status
+
+def _http_error(url, status, body):
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response._content = body.encode('utf-8')
+    return requests.HTTPError(f"{status} Client Error (replayed) for url: {url}", response=response)
+
+class ReplayFetcher:
+    """Serves pages recorded in a directory instead of fetching them, for
+    offline, deterministic benchmarks and load tests.
+
+    A URL is looked up by route and date (see replay_key): a page recorded
+    for that date first, then the route's undated page. Pages recorded
+    with an error status (HWH-to-ZZZ.404.html) and routes with no page at
+    all raise requests.HTTPError, as the live fetcher does for a 404.
+    """
+
+    def __init__(self, directory=REPLAY_DIR):
+        self.directory = directory
+        self._pages = {}
+        for name in os.listdir(directory):
+            if name.endswith('.html'):
+                route, date, status = _parse_replay_filename(name)
+                self._pages[route, date] = (os.path.join(directory, name), status)
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._misses = 0
+
+    def _read(self, path):
+        body = self._bodies.get(path)
+        if body is None:
+            with open(path, encoding='utf-8') as f:
+                body = self._bodies[path] = f.read()
+        return body
+
+    def get(self, url, timeout=None):
+        """Return the recorded page for url; raises requests.HTTPError like PooledFetcher."""
+        route, date = replay_key(url)
+        page = self._pages.get((route, date)) or self._pages.get((route, ''))
+        with self._lock:
+            self._requests += 1
+            if page is None:
+                self._misses += 1
+        if page is None:
+            raise _http_error(url, 404, '')
+        path, status = page
+        body = self._read(path)
+        if status >= 400:
+            raise _http_error(url, status, body)
+        return body
+
+    def stats(self):
+        with self._lock:
+            requests_made, misses = self._requests, self._misses
+        return {
+            'mode': 'replay',
+            'directory': self.directory,
+            'pages': len(self._pages),
+            'requests': requests_made,
+            'misses': misses,
+        }
+
+    def close(self):
+        pass
+
+class RecordingFetcher:
+    """Wraps a live fetcher and saves every page it fetches, error pages
+    included, under the name ReplayFetcher looks it up by."""
+
+    def __init__(self, fetcher, directory=REPLAY_DIR):
+        self.fetcher = fetcher
+        self.directory = directory
+        self._recorded = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _record(self, url, body, status=200):
+        route, date = replay_key(url)
+        with open(os.path.join(self.directory, replay_filename(route, date, status)), 'w', encoding='utf-8') as f:
+            f.write(body)
+        self._recorded += 1
+
+    def get(self, url, timeout=None):
+        try:
+            body = self.fetcher.get(url, timeout=timeout)
+        except requests.HTTPError as e:
+            if e.response is not None:
+                self._record(url, e.response.text, e.response.status_code)
+            raise
+        self._record(url, body)
+        return body
+
+    def stats(self):
+        return {**self.fetcher.stats(), 'mode': 'record', 'directory': self.directory, 'recorded': self._recorded}
+
+    def close(self):
+        self.fetcher.close()
+
+FETCH_MODES = {
+    'live': lambda: PooledFetcher(),
+    'replay': lambda: ReplayFetcher(),
+    'record': lambda: RecordingFetcher(PooledFetcher()),
+}
+
+def make_fetcher(mode=None):
+    mode = mode or FETCH_MODE
+    try:
+        factory = FETCH_MODES[mode]
+    except KeyError:
+        raise ValueError(f"Unknown fetch mode: {mode!r} (expected one of {', '.join(FETCH_MODES)})")
+    return factory()
+
+_default_fetcher = None
+_default_fetcher_lock = threading.Lock()
+
+def get_fetcher():
+    global _default_fetcher
+    with _default_fetcher_lock:
+        if _default_fetcher is None:
+            _default_fetcher = make_fetcher()
+        return _default_fetcher
+
+# requests.HTTPError covers the replay fetcher's recorded error pages
+ASYNC_FETCH_ERRORS = (asyncio.TimeoutError, requests.HTTPError) + ((aiohttp.ClientError,) if aiohttp else ())
+
+class AsyncPooledFetcher:
+    """asyncio counterpart of PooledFetcher built on an aiohttp connection pool.
+
+    pool_size caps open connections overall and max_per_host caps them per
+    host; aiohttp queues requests beyond either limit. The session is bound
+    to the event loop that first uses it and is recreated for a new loop.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, max_per_host=MAX_PER_HOST, timeout=FETCH_TIMEOUT, headers=None):
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for the async scraping engine")
+        self.pool_size = pool_size
+        self.max_per_host = min(max_per_host, pool_size)
+        self.timeout = timeout
+        self.headers = headers or DEFAULT_HEADERS
+        self._session = None
+        self._loop = None
+        self._requests = 0
+
+    def _get_session(self):
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.max_per_host)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._loop = loop
+        return self._session
+
+    async def get(self, url, timeout=None):
+        """Fetch url and return the response body; raises one of ASYNC_FETCH_ERRORS."""
+        session = self._get_session()
+        self._requests += 1
+        kwargs = {'timeout': aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        async with session.get(url, **kwargs) as response:
+            response.raise_for_status()
+            return await response.text()
+
+    def stats(self):
+        return {
+            'requests': self._requests,
+            'pool_size': self.pool_size,
+            'max_per_host': self.max_per_host,
+        }
+
+    async def close(self):
+        if self._session is not None and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+class AsyncReplayFetcher(ReplayFetcher):
+    """ReplayFetcher for the async engine; pages are read from disk once."""
+
+    async def get(self, url, timeout=None):
+        return ReplayFetcher.get(self, url, timeout)
+
+    async def close(self):
+        pass
+
+_default_async_fetcher = None
+
+def get_async_fetcher():
+    global _default_async_fetcher
+    with _default_fetcher_lock:
+        if _default_async_fetcher is None:
+            if FETCH_MODE == 'replay':
+                _default_async_fetcher = AsyncReplayFetcher()
+            elif FETCH_MODE == 'live':
+                _default_async_fetcher = AsyncPooledFetcher()
+            else:
+                raise RuntimeError(f"FETCH_MODE={FETCH_MODE!r} is not supported by the async engine (record with SCRAPE_ENGINE=thread)")
+        return _default_async_fetcher
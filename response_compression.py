@@ -0,0 +1,134 @@
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli and zstd are optional, gzip is always available
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+
+_COMPRESSORS = {}
+if brotli is not None:
+    _COMPRESSORS['br'] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    _COMPRESSORS['zstd'] = lambda body: zstandard.ZstdCompressor(level=3).compress(body)
+_COMPRESSORS['gzip'] = lambda body: gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+# In order of preference when the client accepts several equally
+ENCODINGS = tuple(_COMPRESSORS)
+
+def choose_encoding(accept_encoding):
+    """Best available encoding the Accept-Encoding header allows, or None."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best = None
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+def compress(body, encoding):
+    return _COMPRESSORS[encoding](body)
+
+class EncodedBody:
+    """A rendered response body together with its compressed variants,
+    each compressed on first use and then kept, so a cached payload is
+    compressed once however often it is served."""
+
+    __slots__ = ('body', '_variants')
+
+    def __init__(self, body):
+        self.body = body
+        self._variants = {}
+
+    def encode(self, accept_encoding, min_size=COMPRESS_MIN_SIZE):
+        """Return (bytes, content-encoding or None) for the client."""
+        encoding = choose_encoding(accept_encoding) if len(self.body) >= min_size else None
+        if encoding is None:
+            return self.body, None
+        variant = self._variants.get(encoding)
+        if variant is None:
+            variant = self._variants[encoding] = compress(self.body, encoding)
+        return variant, encoding
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete response bodies of at least
+    min_size bytes with the best encoding the client accepts.
+
+    Responses that already have a Content-Encoding (e.g. served from an
+    EncodedBody) and streamed responses (NDJSON, Server-Sent Events) are
+    passed through untouched, so streams are never buffered.
+    """
+
+    def __init__(self, app, min_size=COMPRESS_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = None
+        for name, value in scope['headers']:
+            if name == b'accept-encoding':
+                accept_encoding = value.decode('latin-1')
+        encoding = choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message['type'] == 'http.response.start':
+                start = message
+                headers = dict(start.get('headers', ()))
+                content_type = headers.get(b'content-type', b'')
+                if b'content-encoding' in headers or content_type.startswith(b'text/event-stream'):
+                    passthrough = True
+                    await send(start)
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            if message.get('more_body', False) or len(body) < self.min_size:
+                # A streamed (or small) body goes out as the app wrote it
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            headers = [(k, v) for k, v in start.get('headers', ()) if k != b'content-length']
+            headers += [
+                (b'content-encoding', encoding.encode('latin-1')),
+                (b'content-length', str(len(compressed)).encode('latin-1')),
+                (b'vary', b'Accept-Encoding'),
+            ]
+            await send({**start, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,208 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+ROUTE_CACHE_TTL = float(os.environ.get('ROUTE_CACHE_TTL', '300'))
+ROUTE_CACHE_SIZE = int(os.environ.get('ROUTE_CACHE_SIZE', '1024'))
+ROUTE_CACHE_STALE_GRACE = float(os.environ.get('ROUTE_CACHE_STALE_GRACE', '600'))
+
+FRESH = 'fresh'
+STALE = 'stale'
+
+class RouteCache:
+    """In-process TTL cache with LRU eviction for parsed route timetables.
+
+    Keys are (src_code, dst_code, date) tuples. Entries younger than ttl
+    seconds are fresh; for a further stale_grace seconds lookup() still
+    returns them, flagged stale, so they can be served while a refresh
+    runs. Older entries are misses. Once maxsize entries are held the
+    least recently used one is evicted.
+    """
+
+    def __init__(self, ttl=ROUTE_CACHE_TTL, maxsize=ROUTE_CACHE_SIZE, stale_grace=ROUTE_CACHE_STALE_GRACE,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.stale_grace = stale_grace
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        """Return (value, FRESH or STALE), or (None, None) on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                age = self._clock() - stored_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value, FRESH
+                if age < self.ttl + self.stale_grace:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    return value, STALE
+                del self._entries[key]
+            self.misses += 1
+            return None, None
+
+    def expires_in(self, key):
+        """Seconds until key's entry stops being fresh, 0 when stale or absent.
+        Does not count as a lookup."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return 0.0
+            return max(0.0, entry[0] + self.ttl - self._clock())
+
+    def get(self, key):
+        value, state = self.lookup(key)
+        return value if state == FRESH else None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self._clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'stale_grace': self.stale_grace,
+            }
+
+class SingleFlight:
+    """Coalesces concurrent async loads of the same key into one call.
+
+    The first caller for a key starts func() as a task; callers arriving
+    while it is in flight await that same task instead of starting their
+    own. The task is shielded, so a cancelled caller does not cancel the
+    load for everyone else.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.flights = 0
+        self.coalesced = 0
+
+    async def do(self, key, func):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.flights += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    def stats(self):
+        return {
+            'flights': self.flights,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._calls),
+        }
+
+class BackgroundRefresher:
+    """Reloads stale cache keys in the background.
+
+    schedule() queues a key at most once until its reload finishes; a
+    worker task started with start() runs up to `concurrency` reloads at
+    a time by awaiting load(*args).
+    """
+
+    def __init__(self, concurrency=4):
+        self.concurrency = concurrency
+        self._queue = None
+        self._pending = set()
+        self._worker = None
+        self._tasks = set()
+        self.refreshes = 0
+        self.failures = 0
+
+    @property
+    def running(self):
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._pending.clear()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(self._worker, *self._tasks, return_exceptions=True)
+        self._worker = None
+
+    def schedule(self, key, load, *args):
+        """Queue a reload of key; returns False if the refresher is not running."""
+        if not self.running:
+            return False
+        if key not in self._pending:
+            self._pending.add(key)
+            self._queue.put_nowait((key, load, args))
+        return True
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            key, load, args = await self._queue.get()
+            await slots.acquire()
+            task = asyncio.create_task(self._refresh(key, load, args))
+            self._tasks.add(task)
+            task.add_done_callback(lambda done: (self._tasks.discard(done), slots.release()))
+
+    async def _refresh(self, key, load, args):
+        try:
+            if await load(*args) is None:
+                self.failures += 1
+            else:
+                self.refreshes += 1
+        except Exception:
+            self.failures += 1
+        finally:
+            self._pending.discard(key)
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'pending': len(self._pending),
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+        }
@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Set TIMETABLE_DB to an empty string to disable the on-disk store
+TIMETABLE_DB = os.environ.get('TIMETABLE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'timetables.sqlite3'))
+TIMETABLE_MAX_AGE = float(os.environ.get('TIMETABLE_MAX_AGE', str(6 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS route_snapshots (
+    src_code TEXT NOT NULL,
+    dst_code TEXT NOT NULL,
+    service_date TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    trains TEXT NOT NULL,
+    PRIMARY KEY (src_code, dst_code, service_date)
+)
+"""
+
+_UPSERT = """
+INSERT INTO route_snapshots (src_code, dst_code, service_date, fetched_at, trains)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (src_code, dst_code, service_date)
+DO UPDATE SET fetched_at = excluded.fetched_at, trains = excluded.trains
+"""
+
+# A route keeps only its latest service date: earlier days are never read again
+_DROP_EARLIER = """
+DELETE FROM route_snapshots WHERE src_code = ? AND dst_code = ? AND service_date < ?
+"""
+
+class TimetableStore:
+    """SQLite store of parsed route timetables, one snapshot per
+    (src_code, dst_code, service_date).
+
+    Snapshots hold the get_train_info records of a route as JSON and
+    survive process restarts; snapshots older than max_age seconds are
+    ignored by get(). Storing a route drops its snapshots for earlier
+    service dates.
+    """
+
+    def __init__(self, path=TIMETABLE_DB, max_age=TIMETABLE_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def _key(src_code, dst_code, service_date):
+        return src_code.strip().upper(), dst_code.strip().upper(), str(service_date)
+
+    def get(self, src_code, dst_code, service_date, max_age=None):
+        """The stored trains, or None when there is no snapshot or it is older
+        than max_age seconds (the store's max_age by default)."""
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at, trains FROM route_snapshots"
+                " WHERE src_code = ? AND dst_code = ? AND service_date = ?",
+                self._key(src_code, dst_code, service_date),
+            ).fetchone()
+        if row is None or time.time() - row[0] > max_age:
+            return None
+        return json.loads(row[1])
+
+    def put(self, src_code, dst_code, service_date, trains):
+        self.bulk_upsert([(src_code, dst_code, service_date, trains)])
+
+    def bulk_upsert(self, snapshots):
+        """Insert or replace many (src_code, dst_code, service_date, trains) snapshots in one
+        transaction, dropping each route's snapshots for earlier dates."""
+        now = time.time()
+        rows = [
+            (*self._key(src_code, dst_code, service_date), now, json.dumps(trains, ensure_ascii=False))
+            for src_code, dst_code, service_date, trains in snapshots
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(_DROP_EARLIER, [row[:3] for row in rows])
+            self._conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def prune(self, before_date):
+        """Delete snapshots for service dates earlier than before_date (YYYYMMDD)."""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM route_snapshots WHERE service_date < ?", (str(before_date),)
+            ).rowcount
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM route_snapshots").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_store():
+    """Return the shared store, or None when TIMETABLE_DB is empty. Opening
+    it deletes snapshots for dates before today."""
+    global _default_store
+    if not TIMETABLE_DB:
+        return None
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = TimetableStore()
+            _default_store.prune(datetime.now().strftime("%Y%m%d"))
+        return _default_store
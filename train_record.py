@@ -0,0 +1,81 @@
+import sys
+from collections.abc import Mapping
+
+_EMPTY = ()
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+def _interned_tuple(values):
+    return tuple(map(_intern, values)) if values else _EMPTY
+
+class TrainRecord(Mapping):
+    """Compact, read-only form of a get_train_info record.
+
+    Holds the same keys as the dict in __slots__ instead of a per-train
+    hash table. Station codes, train types, times and booking classes
+    repeat across a timetable and are interned, so every train of a route
+    shares one copy of each. It is a Mapping, so code written against the
+    dicts (train['train_name'], train.get('category'), TrainInfo(**train))
+    works on records unchanged; booking_classes and notices are tuples.
+    """
+
+    __slots__ = (
+        'train_number', 'train_name', 'train_type', 'source', 'departure_time',
+        'destination', 'arrival_time', 'duration', 'booking_available',
+        'advance_reservation_period', 'start_date', 'end_date', 'booking_classes',
+        'notices', 'has_pantry', 'is_limited_run', 'category',
+    )
+
+    def __init__(self, train_number, train_name, train_type, source, departure_time, destination,
+                 arrival_time, duration, booking_available=False, advance_reservation_period='0',
+                 start_date='', end_date='', booking_classes=_EMPTY, notices=_EMPTY,
+                 has_pantry=False, is_limited_run=False, category=None):
+        self.train_number = train_number
+        self.train_name = train_name
+        self.train_type = _intern(train_type)
+        self.source = _intern(source)
+        self.departure_time = _intern(departure_time)
+        self.destination = _intern(destination)
+        self.arrival_time = _intern(arrival_time)
+        self.duration = _intern(duration)
+        self.booking_available = booking_available
+        self.advance_reservation_period = _intern(advance_reservation_period)
+        self.start_date = _intern(start_date)
+        self.end_date = _intern(end_date)
+        self.booking_classes = _interned_tuple(booking_classes)
+        self.notices = tuple(notices) if notices else _EMPTY
+        self.has_pantry = has_pantry
+        self.is_limited_run = is_limited_run
+        self.category = category
+
+    @classmethod
+    def from_info(cls, info):
+        """Build a record from a get_train_info dict (or a stored snapshot of one)."""
+        return cls(**{key: info[key] for key in cls.__slots__ if key in info})
+
+    def __getitem__(self, key):
+        if key not in _FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __repr__(self):
+        return f"TrainRecord({self.train_number!r}, {self.train_name!r})"
+
+    def as_dict(self):
+        """The get_train_info dict for this record, i.e. the JSON output format."""
+        info = {key: getattr(self, key) for key in self.__slots__}
+        info['booking_classes'] = list(self.booking_classes)
+        info['notices'] = list(self.notices)
+        return info
+
+_FIELDS = frozenset(TrainRecord.__slots__)
+
+def to_records(trains):
+    return [train if isinstance(train, TrainRecord) else TrainRecord.from_info(train) for train in trains]